@@ -0,0 +1,173 @@
+import os
+import glob
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+PROGRESS_FILE = "batch_progress.jsonl"
+
+# Model loaded once per worker process by init_worker
+_worker_model = None
+_worker_device = None
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Batch Video Action Recognition")
+
+    parser.add_argument('inputs', type=str, nargs='+',
+                        help="Video directories, glob patterns or manifest files (.txt, one path per line)")
+    parser.add_argument('--checkpoint', type=str,
+                        default="./checkpoints/UCF101-filtered-lr0.0001-nobackgroundclass/model_e_10.pth",
+                        help="Path to model checkpoint")
+    parser.add_argument('--output_dir', type=str,
+                        default="./outputs/batch",
+                        help="Output directory for the JSON results")
+    parser.add_argument('--window_size', type=int,
+                        default=4,
+                        help="Smoothing window size (in clips of 16 frames)")
+    parser.add_argument('--batch_size', type=int,
+                        default=None,
+                        help="Clips per forward pass (picked from available memory if not specified)")
+    parser.add_argument('--workers', type=int,
+                        default=None,
+                        help="Worker processes (defaults to one per 4 cores)")
+    parser.add_argument('--threads', type=int,
+                        default=None,
+                        help="torch threads per worker (defaults to cores / workers)")
+    parser.add_argument('--device', type=str,
+                        default='cpu',
+                        choices=['cuda', 'cpu'],
+                        help="Computation device of the workers")
+
+    return parser.parse_args()
+
+def collect_videos(inputs):
+    """
+    Expand directories, glob patterns and manifest files into a sorted list of video paths.
+
+    Args:
+        inputs (List[str]): Directories (searched recursively), glob patterns or
+            .txt manifests with one video path per line.
+
+    Returns:
+        List[str]: Unique video paths.
+    """
+    videos = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.update(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        elif item.endswith('.txt') and os.path.isfile(item):
+            with open(item) as f:
+                videos.update(line.strip() for line in f if line.strip())
+        else:
+            videos.update(glob.glob(item, recursive=True))
+    return sorted(videos)
+
+def output_names(videos, done=None):
+    """
+    Map each video to a unique output base name derived from its file name.
+
+    Videos processed in a previous run keep the name recorded in the progress file.
+    """
+    names = dict(done or {})
+    used = set(names.values())
+    for video_path in videos:
+        if video_path in names:
+            continue
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        name, suffix = stem, 1
+        while name in used:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        names[video_path] = name
+    return names
+
+def load_progress(output_dir):
+    """Return the videos already processed in a previous run, mapped to their output names."""
+    done = {}
+    progress_path = os.path.join(output_dir, PROGRESS_FILE)
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut short by a crash
+                if entry.get('status') == 'done':
+                    done[entry['video_path']] = entry['output_name']
+    return done
+
+def init_worker(checkpoint, device, threads):
+    """Load the model once in each worker process."""
+    global _worker_model, _worker_device
+    import torch
+    from src.train.model import load_trained_model
+
+    torch.set_num_threads(threads)
+    _worker_device = torch.device(device)
+    _worker_model = load_trained_model(checkpoint, num_classes=len(CLASS_NAMES), device=_worker_device)
+
+def process_video(video_path, output_name, output_dir, window_size, batch_size):
+    """Classify one video in a worker and write its raw and smoothed JSON outputs."""
+    from src.video.video_process import (
+        classify_video, get_consecutive_classes, get_video_info, save_class_lists,
+    )
+    from src.utils.utils import make_smoother, smooth_stream
+
+    raw_classes, raw_probs, timeline = classify_video(video_path, _worker_model, _worker_device,
+                                                      single_class=False, stream=True,
+                                                      batch_size=batch_size, return_timeline=True)
+    smoothed_probs = smooth_stream(make_smoother('gaussian', window_size), raw_probs)
+    fps, _, _ = get_video_info(video_path)
+
+    save_class_lists(get_consecutive_classes(raw_classes, CLASS_NAMES),
+                     fps, output_dir, f"{output_name}_raw", CLIP_LENGTH, timeline=timeline)
+    save_class_lists(get_consecutive_classes(smoothed_probs.argmax(axis=1), CLASS_NAMES),
+                     fps, output_dir, f"{output_name}_smoothed", CLIP_LENGTH, timeline=timeline)
+    return len(raw_classes)
+
+def main(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    videos = collect_videos(args.inputs)
+    done = load_progress(args.output_dir)
+    names = output_names(videos, done)
+    pending = [v for v in videos if v not in done]
+    print(f"{len(videos)} videos found, {len(videos) - len(pending)} already processed")
+    if not pending:
+        return
+
+    cores = os.cpu_count() or 1
+    workers = min(args.workers or max(1, cores // 4), len(pending))
+    threads = args.threads or max(1, cores // workers)
+
+    progress_path = os.path.join(args.output_dir, PROGRESS_FILE)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(args.checkpoint, args.device, threads)) as executor, \
+            open(progress_path, 'a') as progress:
+        futures = {
+            executor.submit(process_video, video_path, names[video_path], args.output_dir,
+                            args.window_size, args.batch_size): video_path
+            for video_path in pending
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            video_path = futures[future]
+            try:
+                num_clips = future.result()
+                entry = {'video_path': video_path, 'output_name': names[video_path],
+                         'status': 'done', 'clips': num_clips}
+            except Exception as e:
+                entry = {'video_path': video_path, 'output_name': names[video_path],
+                         'status': 'error', 'error': repr(e)}
+            progress.write(json.dumps(entry) + "\n")
+            progress.flush()
+            print(f"[{i}/{len(pending)}] {entry['status']}: {video_path}")
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
@@ -0,0 +1,92 @@
+"""
+Benchmark the CPU inference backends of the R3D_18 classifier.
+
+Reports latency of a single clip and clips/sec on batches for each backend.
+With --checkpoint, --data_path and --annot_path it also reports the accuracy
+difference against the float model on the held-out test list. Run from the
+repository root:
+
+    python -m benchmarks.backends --backends eager static_int8 torchscript
+"""
+import json
+import time
+import argparse
+import torch
+
+from src.train.model import load_new_model, load_trained_model, prepare_inference_model, INFERENCE_BACKENDS
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Inference backend benchmark")
+    parser.add_argument('--backends', type=str, nargs='+', default=list(INFERENCE_BACKENDS),
+                        choices=INFERENCE_BACKENDS)
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help="Trained checkpoint (a randomly initialized model is used if not specified)")
+    parser.add_argument('--data_path', type=str, default=None,
+                        help="UCF101 root, to report the accuracy difference on the test list")
+    parser.add_argument('--annot_path', type=str, default=None,
+                        help="Annotation folder with the train/test lists")
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None,
+                        help="torch intra-op threads (torch default if not specified)")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Optional JSON file for the results")
+    return parser.parse_args()
+
+def time_model(model, inputs, iterations):
+    """Return the mean time in seconds of a forward pass, after one warm-up run."""
+    with torch.no_grad():
+        model(inputs)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return (time.perf_counter() - start) / iterations
+
+def main(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    if args.checkpoint:
+        model = load_trained_model(args.checkpoint, num_classes=5, device='cpu')
+    else:
+        model = load_new_model(num_classes=5, pretrained=False, device='cpu').eval()
+
+    test_loader = None
+    if args.data_path and args.annot_path:
+        from src.data.ucf101_dataset import load_ucf101_dataset
+        _, test_loader = load_ucf101_dataset(args.data_path, args.annot_path, 16, 16,
+                                             test_batch_size=args.batch_size)
+        calibration = next(iter(test_loader))[0]
+    else:
+        calibration = torch.randn(args.batch_size, 3, 16, 112, 112)
+
+    single = calibration[:1]
+    batch = calibration[:args.batch_size]
+    results = {}
+    backend_models = {}
+    for backend in args.backends:
+        backend_model = prepare_inference_model(model, backend, calibration)
+        latency = time_model(backend_model, single, args.iterations)
+        batch_time = time_model(backend_model, batch, args.iterations)
+        results[backend] = {
+            'latency_ms': latency * 1000,
+            'clips_per_sec': batch.size(0) / batch_time,
+        }
+        if backend != 'eager':
+            backend_models[backend] = backend_model
+        print(f"{backend:<15} latency={latency * 1000:.1f} ms  clips/sec={batch.size(0) / batch_time:.2f}")
+
+    if test_loader is not None:
+        from src.train.evaluate import compare_inference_backends
+        accuracy = compare_inference_backends(model, backend_models, test_loader)
+        for backend in results:
+            results[backend].update(accuracy['float' if backend == 'eager' else backend])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
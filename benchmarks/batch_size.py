@@ -0,0 +1,85 @@
+"""
+Benchmark classify_video on CPU at different batch sizes.
+
+Each batch size runs in a fresh process so the reported peak RSS is not
+inflated by earlier runs. Run from the repository root:
+
+    python -m benchmarks.batch_size --batch_sizes 1 4 8 16
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="classify_video batch size benchmark")
+    parser.add_argument('--video_path', type=str, default=None,
+                        help="Input video (a synthetic video is generated if not specified)")
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--num_frames', type=int, default=320,
+                        help="Length of the synthetic video in frames")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="torch intra-op threads (torch default if not specified)")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Optional JSON file for the results")
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def run_worker(args):
+    """Classify the video once with the given batch size and print the measurements as JSON."""
+    import torch
+    from src.train.model import load_new_model
+    from src.video.video_process import classify_video
+    from src.utils.profiling import peak_rss_mb
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device('cpu')
+    model = load_new_model(num_classes=5, pretrained=False, device='cpu')
+
+    start = time.perf_counter()
+    classes, _ = classify_video(args.video_path, model, device, single_class=False,
+                                stream=True, batch_size=args.worker)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'batch_size': args.worker,
+        'clips': len(classes),
+        'seconds': elapsed,
+        'clips_per_sec': len(classes) / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.video_path is None:
+            from benchmarks.synthetic import make_synthetic_video
+            args.video_path = make_synthetic_video(os.path.join(tmp_dir, 'synthetic.mp4'),
+                                                   num_frames=args.num_frames)
+
+        results = []
+        for batch_size in args.batch_sizes:
+            command = [sys.executable, '-m', 'benchmarks.batch_size',
+                       '--video_path', args.video_path, '--worker', str(batch_size)]
+            if args.threads:
+                command += ['--threads', str(args.threads)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            peak_rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "unknown"
+            print(f"batch_size={result['batch_size']:<4} clips/sec={result['clips_per_sec']:.2f} "
+                  f"peak RSS={peak_rss}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.worker is not None:
+        run_worker(args)
+    else:
+        main(args)
@@ -0,0 +1,86 @@
+"""
+Benchmark inference cold start: import time and model load time.
+
+Every measurement runs in a fresh Python process. The model load is timed for
+the previous path (random initialization followed by load_state_dict) and for
+load_trained_model (meta-device build plus memory-mapped checkpoint). The old
+path also downloaded the Kinetics-400 weights, which is not included here.
+Run from the repository root:
+
+    python -m benchmarks.startup --checkpoint path/to/model.pth
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import inference
+print(time.perf_counter() - start)
+"""
+
+EAGER_LOAD_SNIPPET = """
+import sys, time
+import torch
+from src.train.model import load_new_model
+start = time.perf_counter()
+model = load_new_model(num_classes=5, pretrained=False, device='cpu', freeze_params=True)
+model.load_state_dict(torch.load(sys.argv[1], map_location='cpu'))
+model.eval()
+print(time.perf_counter() - start)
+"""
+
+FAST_LOAD_SNIPPET = """
+import sys, time
+import torch
+from src.train.model import load_trained_model
+start = time.perf_counter()
+model = load_trained_model(sys.argv[1], num_classes=5, device='cpu')
+print(time.perf_counter() - start)
+"""
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Inference cold start benchmark")
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help="Checkpoint to load (a random one is written if not specified)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None,
+                        help="Optional JSON file for the results")
+    return parser.parse_args()
+
+def time_snippet(snippet, *args):
+    """Run a snippet in a fresh interpreter and return the seconds it prints."""
+    output = subprocess.run([sys.executable, '-c', snippet, *args], check=True,
+                            capture_output=True, text=True, cwd=os.getcwd()).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint = args.checkpoint
+        if checkpoint is None:
+            import torch
+            from src.train.model import load_new_model
+            checkpoint = os.path.join(tmp_dir, 'model.pth')
+            torch.save(load_new_model(num_classes=5, pretrained=False, device='cpu').state_dict(), checkpoint)
+
+        results = {}
+        for name, snippet, snippet_args in [
+            ('import_inference', IMPORT_SNIPPET, []),
+            ('load_eager', EAGER_LOAD_SNIPPET, [checkpoint]),
+            ('load_fast', FAST_LOAD_SNIPPET, [checkpoint]),
+        ]:
+            times = [time_snippet(snippet, *snippet_args) for _ in range(args.repeats)]
+            results[name] = {'min_sec': min(times), 'mean_sec': sum(times) / len(times)}
+            print(f"{name:<18} min={min(times) * 1000:.0f} ms  mean={sum(times) / len(times) * 1000:.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
@@ -0,0 +1,313 @@
+"""
+End-to-end benchmark suite with synthetic videos and a regression check.
+
+Generates synthetic videos with cv2 for every requested resolution, then
+measures, each case in a fresh process with a randomly initialized R3D_18
+(fixed seed, no download):
+
+    pipeline  inference.run_pipeline (two passes) and inference.run_single_pass,
+              stage by stage (decode, resize, preprocess, forward, smooth,
+              overlay, encode), for every video
+    classify  classify_video clips/sec for every batch size and thread count
+    annotate  annotate_video_with_classes frames/sec
+    loader    load_ucf101_dataset samples/sec on a synthetic UCF101 tree
+
+Results are written as JSON. With --baseline, every metric is compared with
+the stored run and the suite exits with status 1 if any metric is worse by
+more than --threshold (rates must not drop, times and memory must not grow).
+Run from the repository root:
+
+    python -m benchmarks.suite --output results.json --baseline benchmarks/baseline.json
+
+benchmarks/baseline.json was recorded with the default settings on a CPU-only
+container. Timings depend on the machine, so record a baseline on the machine
+that runs the check (with the same settings as the later runs) and commit it:
+
+    python -m benchmarks.suite --output benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+from src.utils.profiling import peak_rss_mb
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite")
+    parser.add_argument('--resolutions', type=str, nargs='+', default=['320x240'],
+                        help="Synthetic video sizes, as WIDTHxHEIGHT")
+    parser.add_argument('--num_frames', type=int, default=64,
+                        help="Length of the synthetic videos in frames")
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--threads', type=int, nargs='+', default=[0],
+                        help="torch intra-op thread counts (0 keeps the torch default)")
+    parser.add_argument('--cases', type=str, nargs='+', default=['pipeline', 'classify', 'annotate', 'loader'],
+                        choices=['pipeline', 'classify', 'annotate', 'loader'])
+    parser.add_argument('--output', type=str, default=None,
+                        help="JSON file for the results")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="Stored results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Allowed relative regression before failing")
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def _load_model(threads):
+    import torch
+    from src.train.model import load_new_model
+
+    if threads:
+        torch.set_num_threads(threads)
+    torch.manual_seed(0)
+    model = load_new_model(num_classes=len(CLASS_NAMES), pretrained=False, device='cpu')
+    return model.eval(), torch.device('cpu')
+
+def bench_pipeline(spec, tmp_dir):
+    """Run the inference.py pipeline (two passes, or --single_pass) on one video with profiling enabled."""
+    import inference
+    from src.utils import profiling
+
+    model, device = _load_model(spec['threads'])
+    args = inference.parse_arguments(['--video_path', spec['video_path'], '--output_dir', tmp_dir,
+                                      '--device', 'cpu', '--stream', '--batch_size', str(spec['batch_size'])])
+    profiler = profiling.enable()
+    if spec['single_pass']:
+        inference.run_single_pass(args, model, device)
+    else:
+        inference.run_pipeline(args, model, device)
+    profiling.disable()
+
+    report = profiler.report()
+    result = {'wall_sec': report['wall_sec']}
+    result.update({f"{name}_sec": stats['total_sec'] for name, stats in report['stages'].items()})
+    result.update({name: rate for name, rate in report['rates'].items()
+                   if name in ('frames_per_sec', 'clips_per_sec')})
+    return result
+
+def bench_classify(spec, tmp_dir):
+    """Time classify_video with one batch size and thread count."""
+    from src.video.video_process import classify_video
+
+    model, device = _load_model(spec['threads'])
+    start = time.perf_counter()
+    classes, _ = classify_video(spec['video_path'], model, device, single_class=False,
+                                stream=True, batch_size=spec['batch_size'])
+    return {'clips_per_sec': len(classes) / (time.perf_counter() - start)}
+
+def bench_annotate(spec, tmp_dir):
+    """Time annotate_video_with_classes with alternating labels."""
+    from src.video.timeline import Timeline
+    from src.video.video_process import annotate_video_with_classes
+
+    timeline = Timeline.from_video(spec['video_path'])
+    num_clips = -(-timeline.num_frames // CLIP_LENGTH)
+    class_list = [(CLASS_NAMES[i % len(CLASS_NAMES)], 1) for i in range(num_clips)]
+    start = time.perf_counter()
+    annotate_video_with_classes(spec['video_path'], class_list, tmp_dir, "annotated",
+                                frames_per_class=CLIP_LENGTH, timeline=timeline)
+    return {'frames_per_sec': timeline.num_frames / (time.perf_counter() - start)}
+
+def make_synthetic_ucf101(root, num_classes=2, videos_per_class=4, num_frames=48):
+    """Write a small UCF101-style tree (class folders, classInd and split lists) of synthetic .avi videos."""
+    from benchmarks.synthetic import make_synthetic_video
+
+    data_path = os.path.join(root, "UCF101")
+    annot_path = os.path.join(root, "split_info")
+    os.makedirs(annot_path, exist_ok=True)
+    train, test = [], []
+    for c, class_name in enumerate(CLASS_NAMES[:num_classes]):
+        os.makedirs(os.path.join(data_path, class_name), exist_ok=True)
+        for g in range(videos_per_class):
+            name = f"{class_name}/v_{class_name}_g{g + 1:02d}_c01.avi"
+            make_synthetic_video(os.path.join(data_path, name), num_frames=num_frames, seed=c * 100 + g)
+            (test if g == 0 else train).append(f"{name} {c + 1}")
+    with open(os.path.join(annot_path, "classInd.txt"), 'w') as f:
+        f.writelines(f"{c + 1} {name}\n" for c, name in enumerate(CLASS_NAMES[:num_classes]))
+    with open(os.path.join(annot_path, "trainlist01.txt"), 'w') as f:
+        f.writelines(line + "\n" for line in train)
+    with open(os.path.join(annot_path, "testlist01.txt"), 'w') as f:
+        f.writelines(line + "\n" for line in test)
+    return data_path, annot_path
+
+def bench_loader(spec, tmp_dir):
+    """Measure load_ucf101_dataset train loader samples/sec on a synthetic UCF101 tree."""
+    import torch
+    from src.data.ucf101_dataset import load_ucf101_dataset
+
+    if spec['threads']:
+        torch.set_num_threads(spec['threads'])
+    data_path, annot_path = make_synthetic_ucf101(tmp_dir)
+    train_loader, _ = load_ucf101_dataset(data_path, annot_path, CLIP_LENGTH, CLIP_LENGTH,
+                                          batch_size=spec['batch_size'],
+                                          metadata_cache_path=os.path.join(tmp_dir, "metadata.pt"),
+                                          scan_workers=1)
+    samples = 0
+    start = time.perf_counter()
+    for inputs, _ in train_loader:
+        samples += inputs.size(0)
+    return {'samples_per_sec': samples / (time.perf_counter() - start)}
+
+BENCHMARKS = {
+    'pipeline': bench_pipeline,
+    'classify': bench_classify,
+    'annotate': bench_annotate,
+    'loader': bench_loader,
+}
+
+def run_worker(spec):
+    """Run one case and print its metrics (plus peak RSS) as JSON."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = BENCHMARKS[spec['case']](spec, tmp_dir)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+def run_case(spec):
+    """Run a case in a fresh process; failures are recorded instead of stopping the suite."""
+    command = [sys.executable, '-m', 'benchmarks.suite', '--worker', json.dumps(spec)]
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed'}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, threshold, min_sec=0.5):
+    """
+    Compare every metric with the baseline.
+
+    Metrics ending in _per_sec must not drop, and metrics ending in _sec or _mb must not
+    grow, by more than `threshold` (relative). Times below `min_sec` in the baseline
+    (short stages, or imports timed inside a stage) vary too much between identical runs
+    and are skipped, as are cases without baseline metrics (see unchecked_cases). A case
+    that worked in the baseline but fails now is a regression.
+
+    Returns:
+        List[str]: Description of each regression.
+    """
+    regressions = []
+    for case, metrics in results.items():
+        if 'error' in metrics and baseline.get(case) and 'error' not in baseline[case]:
+            regressions.append(f"{case}: failed ({metrics['error']})")
+        for name, value in metrics.items():
+            reference = baseline.get(case, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(reference, (int, float)) or reference <= 0:
+                continue
+            if name.endswith('_per_sec'):
+                change = (reference - value) / reference
+            elif name.endswith('_sec') and reference < min_sec:
+                continue
+            elif name.endswith('_sec') or name.endswith('_mb'):
+                change = (value - reference) / reference
+            else:
+                continue
+            if change > threshold:
+                regressions.append(f"{case} {name}: {reference:.3f} -> {value:.3f} ({change:+.0%} worse)")
+    return regressions
+
+def unchecked_cases(results, baseline):
+    """
+    List the cases of this run that compare() cannot check against the baseline.
+
+    Returns:
+        List[str]: Description of each case missing from the baseline or recorded there
+            as a failure, so it has no metrics to compare with.
+    """
+    unchecked = []
+    for case in results:
+        if case not in baseline:
+            unchecked.append(f"{case}: missing from the baseline")
+        elif 'error' in baseline[case]:
+            unchecked.append(f"{case}: failed when the baseline was recorded ({baseline[case]['error']})")
+    return unchecked
+
+def main(args):
+    import torch
+    from benchmarks.synthetic import make_synthetic_video
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        videos = {}
+        for resolution in args.resolutions:
+            width, height = (int(v) for v in resolution.lower().split('x'))
+            name = f"{width}x{height}_{args.num_frames}f_{args.fps:g}fps"
+            videos[name] = make_synthetic_video(os.path.join(tmp_dir, f"{name}.mp4"), width, height,
+                                                args.num_frames, args.fps)
+        first_video = next(iter(videos.values()))
+
+        specs = {}
+        if 'pipeline' in args.cases:
+            for name, path in videos.items():
+                for mode in ('two_pass', 'single_pass'):
+                    specs[f"pipeline/{mode}/{name}"] = {'case': 'pipeline', 'video_path': path,
+                                                        'single_pass': mode == 'single_pass',
+                                                        'batch_size': max(args.batch_sizes),
+                                                        'threads': args.threads[0]}
+        if 'classify' in args.cases:
+            for threads in args.threads:
+                for batch_size in args.batch_sizes:
+                    specs[f"classify/bs{batch_size}_t{threads or 'default'}"] = {
+                        'case': 'classify', 'video_path': first_video,
+                        'batch_size': batch_size, 'threads': threads}
+        if 'annotate' in args.cases:
+            for name, path in videos.items():
+                specs[f"annotate/{name}"] = {'case': 'annotate', 'video_path': path, 'threads': args.threads[0]}
+        if 'loader' in args.cases:
+            specs["loader/synthetic_ucf101"] = {'case': 'loader', 'batch_size': max(args.batch_sizes),
+                                                'threads': args.threads[0]}
+
+        for case, spec in specs.items():
+            results[case] = run_case(spec)
+            summary = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                                for k, v in results[case].items() if k.endswith(('per_sec', 'rss_mb', 'error')))
+            print(f"{case:<40} {summary}")
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'baseline', 'worker')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        settings = ('resolutions', 'num_frames', 'fps', 'batch_sizes', 'threads')
+        if any(baseline['config'].get(key) != report['config'][key] for key in settings):
+            print(f"\nWarning: {args.baseline} was recorded with different settings; "
+                  f"only the cases both runs share are compared")
+        if baseline['environment'].get('cpu_count') != report['environment']['cpu_count']:
+            print(f"\nWarning: {args.baseline} was recorded on a machine with "
+                  f"{baseline['environment'].get('cpu_count')} CPUs")
+        unchecked = unchecked_cases(results, baseline['results'])
+        if unchecked:
+            print(f"\nWarning: {len(unchecked)} case(s) have no baseline metrics and are not checked; "
+                  f"record the baseline on a machine where they run:")
+            for case in unchecked:
+                print(f"  {case}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regression beyond {args.threshold:.0%} against {args.baseline}"
+              + (f" ({len(unchecked)} case(s) not checked)" if unchecked else ""))
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.worker is not None:
+        run_worker(json.loads(args.worker))
+    else:
+        main(args)
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+
+def make_synthetic_video(path, width=320, height=240, num_frames=160, fps=30.0, seed=0):
+    """
+    Write a synthetic test video with cv2: a noisy background with a moving square.
+
+    Args:
+        path (str): Output video path (.mp4 or .avi).
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        num_frames (int): Number of frames.
+        fps (float): Frame rate.
+        seed (int): Seed for the background noise.
+
+    Returns:
+        str: Path of the written video.
+    """
+    fourcc = cv2.VideoWriter_fourcc(*('XVID' if path.endswith('.avi') else 'mp4v'))
+    writer = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    if not writer.isOpened():
+        raise ValueError(f"Could not open video writer for {path}")
+
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    size = max(8, min(width, height) // 6)
+    for i in range(num_frames):
+        frame = background.copy()
+        x = (i * 7) % max(1, width - size)
+        y = (i * 3) % max(1, height - size)
+        frame[y:y + size, x:x + size] = (0, 255, 0)
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,49 @@
+import json
+import argparse
+import urllib.error
+import urllib.request
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Client for the action recognition server (server.py)")
+
+    parser.add_argument('video_path', type=str,
+                        help="Video to classify")
+    parser.add_argument('--url', type=str,
+                        default="http://127.0.0.1:8000",
+                        help="Server address")
+    parser.add_argument('--by_path', action='store_true',
+                        help="Send the path instead of uploading the file (server needs --allow_paths)")
+    parser.add_argument('--step', type=int,
+                        default=16,
+                        help="Frames between the starts of consecutive clips (with --by_path)")
+    parser.add_argument('--timeout', type=float,
+                        default=120.0,
+                        help="Request timeout in seconds")
+
+    return parser.parse_args()
+
+def classify(url, video_path, by_path=False, step=16, timeout=120.0):
+    """Send a video to the server and return the decoded JSON response."""
+    if by_path:
+        data = json.dumps({'video_path': video_path, 'step': step}).encode()
+        content_type = 'application/json'
+    else:
+        with open(video_path, 'rb') as f:
+            data = f.read()
+        content_type = 'application/octet-stream'
+    request = urllib.request.Request(f"{url}/classify", data=data, method='POST',
+                                     headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Server returned {e.code}: {e.read().decode()}") from None
+
+def main(args):
+    result = classify(args.url, args.video_path, args.by_path, args.step, args.timeout)
+    print(f"{len(result['predicted_classes'])} clips in {result['elapsed_sec']:.2f} s")
+    print(json.dumps(result['segments'], indent=4))
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
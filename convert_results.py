@@ -0,0 +1,22 @@
+import argparse
+
+from src.video.results import results_to_json
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Convert .npz results to the segment JSON files")
+
+    parser.add_argument('results', type=str, nargs='+',
+                        help=".npz files written with inference.py --output_format npz")
+    parser.add_argument('--output_dir', type=str,
+                        default=None,
+                        help="Output directory (next to each .npz file if not specified)")
+
+    return parser.parse_args()
+
+def main(args):
+    for path in args.results:
+        print(results_to_json(path, args.output_dir))
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
@@ -0,0 +1,47 @@
+import argparse
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Headless evaluation of a trained model on the UCF101 test split")
+
+    parser.add_argument('--checkpoint', type=str,
+                        default="./checkpoints/UCF101-filtered-lr0.0001-nobackgroundclass/model_e_10.pth",
+                        help="Path to model checkpoint")
+    parser.add_argument('--data_path', type=str, default="./data/Split/UCF101-filtered",
+                        help="UCF101 video directory")
+    parser.add_argument('--annot_path', type=str, default="./data/Split/split_info-filtered",
+                        help="UCF101 split files directory")
+    parser.add_argument('--output_dir', type=str, default="./outputs/evaluation",
+                        help="Directory for evaluation.json and the PNG plots")
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help="Test clips per forward pass")
+    parser.add_argument('--num_workers', type=int, default=0,
+                        help="DataLoader worker processes")
+    parser.add_argument('--metadata_cache', type=str, default=None,
+                        help="Video metadata cache file (see load_video_metadata)")
+    parser.add_argument('--bf16', action='store_true',
+                        help="Run the forward pass under bfloat16 autocast")
+    parser.add_argument('--device', type=str, default=None,
+                        help="Force computation device (auto-detected if not specified)")
+
+    return parser.parse_args()
+
+def main(args):
+    import torch
+    from src.data.ucf101_dataset import load_ucf101_dataset
+    from src.train.model import load_trained_model
+    from src.train.evaluate import evaluate_model
+
+    device = torch.device(args.device if args.device else
+                          'cuda' if torch.cuda.is_available() else 'cpu')
+    model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device=device)
+    _, test_loader = load_ucf101_dataset(args.data_path, args.annot_path, CLIP_LENGTH, CLIP_LENGTH,
+                                         metadata_cache_path=args.metadata_cache,
+                                         test_batch_size=args.batch_size, num_workers=args.num_workers)
+    evaluate_model(model, test_loader, device, CLASS_NAMES, output_dir=args.output_dir, show=False,
+                   amp_dtype=torch.bfloat16 if args.bf16 else None)
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
@@ -0,0 +1,32 @@
+import argparse
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+from src.train.model import load_trained_model
+from src.train.onnx_model import export_onnx, OnnxRuntimeModel, check_backends_match
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Export the trained model to ONNX")
+
+    parser.add_argument('--checkpoint', type=str,
+                        default="./checkpoints/UCF101-filtered-lr0.0001-nobackgroundclass/model_e_10.pth",
+                        help="Path to model checkpoint")
+    parser.add_argument('--output', type=str,
+                        default="./checkpoints/model.onnx",
+                        help="Output ONNX file")
+
+    return parser.parse_args()
+
+def main(args):
+    import torch
+
+    model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device='cpu')
+    export_onnx(model, args.output, clip_length=CLIP_LENGTH)
+
+    # Check the exported model with a batch size different from the export one
+    max_diff = check_backends_match(model, OnnxRuntimeModel(args.output),
+                                    torch.randn(2, 3, CLIP_LENGTH, 112, 112))
+    print(f"Exported {args.output} (max probability difference vs torch: {max_diff:.2e})")
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
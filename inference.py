@@ -2,16 +2,24 @@ import os
 import json
 import argparse
 import torch
-import cv2
 from collections import defaultdict
 
 from src.video.video_process import (
     classify_video,
+    classify_and_annotate_video,
     get_consecutive_classes,
     annotate_video_with_classes,
+    sample_clips,
 )
-from src.train.model import load_new_model
-from src.utils.utils import smooth_predictions
+from src.video.results import save_results
+from src.video.timeline import Timeline
+from src.train.model import load_trained_model, prepare_inference_model, INFERENCE_BACKENDS
+from src.train.onnx_model import OnnxRuntimeModel, check_backends_match
+from src.utils.utils import make_smoother, smooth_stream, SMOOTHERS
+from src.utils.cache import ProbabilityCache
+from src.utils import profiling
+
+CLIP_LENGTH = 16
 
 CLASS_NAMES = [
     "ApplyEyeMakeup",
@@ -21,7 +29,7 @@ CLASS_NAMES = [
     "Haircut"
 ]
 
-def parse_arguments():
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser(description="Video Action Recognition Pipeline")
     
     parser.add_argument('--checkpoint', type=str, 
@@ -38,63 +46,242 @@ def parse_arguments():
                         help="Base name for output files")
     parser.add_argument('--window_size', type=int,
                         default=4,
-                        help="Smoothing window size (frames)")
+                        help="Smoothing window size (in clips of 16 frames)")
+    parser.add_argument('--smoother', type=str,
+                        default='gaussian',
+                        choices=SMOOTHERS,
+                        help="Smoothing of the predictions: fixed-lag Gaussian, causal moving average "
+                             "or Viterbi decoding with a switching penalty")
+    parser.add_argument('--switch_penalty', type=float,
+                        default=2.0,
+                        help="Cost of a label change for --smoother viterbi (log-probability units)")
     parser.add_argument('--device', type=str,
                         default=None,
                         choices=['cuda', 'cpu'],
                         help="Force computation device (auto-detected if not specified)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Decode the video incrementally instead of loading it whole into memory")
+    parser.add_argument('--batch_size', type=int,
+                        default=None,
+                        help="Clips per forward pass (picked from available memory if not specified)")
+    parser.add_argument('--single_pass', action='store_true',
+                        help="Decode the video once and share the frames between the classifier and the annotated outputs")
+    parser.add_argument('--max_buffer_mb', type=float,
+                        default=1024,
+                        help="Memory for decoded frames waiting for their labels with --single_pass "
+                             "(past it the rest of the video is decoded again)")
+    parser.add_argument('--backend', type=str,
+                        default='eager',
+                        choices=INFERENCE_BACKENDS,
+                        help="CPU inference backend (static_int8 is calibrated on the first clips of the video)")
+    parser.add_argument('--onnx_model', type=str,
+                        default=None,
+                        help="Run the model with ONNX Runtime from this exported .onnx file (see export_onnx.py)")
+    parser.add_argument('--intra_op_threads', type=int,
+                        default=None,
+                        help="ONNX Runtime threads inside each operator")
+    parser.add_argument('--inter_op_threads', type=int,
+                        default=None,
+                        help="ONNX Runtime threads across independent operators")
+    parser.add_argument('--skip_backend_check', action='store_true',
+                        help="Do not compare the ONNX Runtime probabilities with the torch checkpoint at startup")
+    parser.add_argument('--render', type=str,
+                        default='burn',
+                        choices=['burn', 'subtitles', 'none'],
+                        help="Draw labels on the video, write them as SRT subtitles, or only write the JSON files")
+    parser.add_argument('--step', type=int,
+                        default=CLIP_LENGTH,
+                        help="Frames between the starts of consecutive clips; values below 16 use "
+                             "overlapping clips and per-frame predictions")
+    parser.add_argument('--output_format', type=str,
+                        default='json',
+                        choices=['json', 'npz', 'both'],
+                        help="Write the segment JSON files, compact .npz files with the probabilities "
+                             "and segment tables (see src/video/results.py), or both")
+    parser.add_argument('--profile', type=str,
+                        default=None,
+                        help="Write per-stage timings, counters, throughput and peak RSS to this JSON file")
+    parser.add_argument('--profile_trace', type=str,
+                        default=None,
+                        help="Also record a torch.profiler trace to this file (Chrome trace format)")
+    parser.add_argument('--cache_dir', type=str,
+                        default=None,
+                        help="Reuse the raw probabilities of videos already processed with the same "
+                             "checkpoint and settings from this directory (no cache if not specified)")
+    parser.add_argument('--cache_size_mb', type=int,
+                        default=1024,
+                        help="Maximum size of the probability cache; least recently used entries are evicted")
+
+    args = parser.parse_args(argv)
+    if not 1 <= args.step <= CLIP_LENGTH:
+        parser.error(f"--step must be between 1 and {CLIP_LENGTH}")
+    if args.backend != 'eager' and args.onnx_model:
+        parser.error("--backend cannot be combined with --onnx_model")
+    if args.backend != 'eager' and args.device and torch.device(args.device).type != 'cpu':
+        parser.error(f"--backend {args.backend} is only available on CPU")
+    return args
+
+def run_single_pass(args, model, device):
+    """Classify and annotate the video decoding it only once, returning the outputs, probabilities and timeline."""
+    # One label per clip, so the window is rescaled to clips spaced `step` frames apart
+    window_size = args.window_size * CLIP_LENGTH // args.step
+    raw_name, smoothed_name = f"{args.output_name}_raw", f"{args.output_name}_smoothed"
+    _, raw_probs, results, output_probs, timeline = classify_and_annotate_video(
+        args.video_path, model, device, CLASS_NAMES, args.output_dir,
+        {
+            raw_name: None,
+            smoothed_name: make_smoother(args.smoother, window_size, args.switch_penalty),
+        },
+        clip_length=CLIP_LENGTH, step=args.step, batch_size=args.batch_size, render=args.render,
+        write_json=args.output_format != 'npz', max_buffer_mb=args.max_buffer_mb, return_details=True
+    )
+    return results[raw_name], results[smoothed_name], raw_probs, output_probs[smoothed_name], timeline
+
+def run_pipeline(args, model, device, raw_probs=None, per_frame=None):
+    """
+    Classify the video (unless its probabilities are given), smooth the predictions and annotate the outputs.
+
+    Returns the raw and smoothed outputs, the raw and smoothed probabilities and the timeline.
+    """
+    # Process video (one prediction per frame when clips overlap)
+    if per_frame is None:
+        per_frame = args.step < CLIP_LENGTH
+    frames_per_class = 1 if per_frame else args.step
+    if raw_probs is None:
+        _, raw_probs, timeline = classify_video(args.video_path, model, device, single_class=False,
+                                                clip_length=CLIP_LENGTH, step=args.step,
+                                                stream=args.stream, batch_size=args.batch_size,
+                                                per_frame=per_frame, return_timeline=True)
+    else:
+        timeline = Timeline.from_video(args.video_path)
+    raw_classes = raw_probs.argmax(axis=1)
 
-    return parser.parse_args()
 
-def main(args):
-    # Configure device
-    device = torch.device(args.device if args.device else 
-                         'cuda' if torch.cuda.is_available() else 'cpu')
-    
-    # Load model
-    model = load_new_model(num_classes=5, pretrained=True, 
-                          device=device.type, freeze_params=True)
-    model.load_state_dict(torch.load(args.checkpoint, map_location=device))
-    model.eval()
-    model.to(device)
-
-    # Process video
-    raw_classes, raw_probs = classify_video(args.video_path, model, device, single_class=False)
-    
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
 
-    # Get video metadata
-    cap = cv2.VideoCapture(args.video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    cap.release()
-
     # Create raw video
     raw_consecutive = get_consecutive_classes(raw_classes, CLASS_NAMES)
-    raw_video_path, _ = annotate_video_with_classes(
+    raw_outputs = annotate_video_with_classes(
         args.video_path,
         raw_consecutive,
         args.output_dir,
-        f"{args.output_name}_raw"
+        f"{args.output_name}_raw",
+        frames_per_class=frames_per_class,
+        render=args.render,
+        write_json=args.output_format != 'npz',
+        timeline=timeline
     )
 
     # Create smoothed video
-    smoothed_classes, smoothed_probs = smooth_predictions(
-        raw_classes, raw_probs, window_size=args.window_size
-    )
+    smoother = make_smoother(args.smoother, args.window_size * CLIP_LENGTH // frames_per_class,
+                             args.switch_penalty)
+    smoothed_probs = smooth_stream(smoother, raw_probs)
     smoothed_consecutive = get_consecutive_classes(
         smoothed_probs.argmax(axis=1), CLASS_NAMES
     )
-    smooth_video_path, _ = annotate_video_with_classes(
+    smoothed_outputs = annotate_video_with_classes(
         args.video_path,
         smoothed_consecutive,
         args.output_dir,
-        f"{args.output_name}_smoothed"
+        f"{args.output_name}_smoothed",
+        frames_per_class=frames_per_class,
+        render=args.render,
+        write_json=args.output_format != 'npz',
+        timeline=timeline
     )
+    return raw_outputs, smoothed_outputs, raw_probs, smoothed_probs, timeline
 
+def save_npz_outputs(args, raw_probs, smoothed_probs, timeline, per_frame):
+    """Save the raw and smoothed probabilities and segments of the run as .npz files."""
+    frames_per_class = 1 if per_frame else args.step
+    paths = []
+    for suffix, probs in [("raw", raw_probs), ("smoothed", smoothed_probs)]:
+        path = os.path.join(args.output_dir, f"{args.output_name}_{suffix}.npz")
+        paths.append(save_results(path, probs, CLASS_NAMES, timeline.fps, frames_per_class, CLIP_LENGTH, args.step,
+                                  timeline=timeline))
+    return paths
+
+def print_summary(args, device, raw_outputs, smoothed_outputs, npz_paths=None):
+    """Print where the raw and smoothed outputs were written."""
     print(f"\nProcessing complete!\nDevice used: {device}")
-    print(f"Raw video: {raw_video_path}")
-    print(f"Smoothed video: {smooth_video_path}")
+    for i, (label, (output_path, config_path)) in enumerate([("Raw", raw_outputs), ("Smoothed", smoothed_outputs)]):
+        if args.render == 'burn':
+            print(f"{label} video: {output_path}")
+        elif args.render == 'subtitles':
+            print(f"{label} subtitles: {output_path}")
+        elif config_path is not None:
+            print(f"{label} actions: {config_path}")
+        if npz_paths:
+            print(f"{label} results: {npz_paths[i]}")
+
+def run(args):
+    # Configure device (the non-eager backends only run on CPU)
+    device = torch.device(args.device if args.device else
+                         'cuda' if torch.cuda.is_available() and args.backend == 'eager' else 'cpu')
+    
+    # Look up the raw probabilities of a previous run (single-pass runs store one row per clip)
+    cache, cache_key, cached_probs = None, None, None
+    per_frame = args.step < CLIP_LENGTH and not args.single_pass
+    if args.cache_dir:
+        cache = ProbabilityCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 ** 2)
+        cache_key = cache.key(args.video_path, args.onnx_model or args.checkpoint,
+                              clip_length=CLIP_LENGTH, step=args.step, per_frame=per_frame,
+                              backend='onnx' if args.onnx_model else args.backend)
+        cached_probs = cache.get(cache_key)
+
+    if cached_probs is not None:
+        # Smoothing and annotation only: the model is not even loaded
+        print("Using cached probabilities")
+        raw_outputs, smoothed_outputs, _, smoothed_probs, timeline = run_pipeline(args, None, device,
+                                                                                  cached_probs, per_frame)
+        npz_paths = save_npz_outputs(args, cached_probs, smoothed_probs, timeline, per_frame) \
+            if args.output_format != 'json' else None
+        print_summary(args, device, raw_outputs, smoothed_outputs, npz_paths)
+        return
+
+    # Load model
+    if args.onnx_model:
+        device = torch.device('cpu')
+        model = OnnxRuntimeModel(args.onnx_model, args.intra_op_threads, args.inter_op_threads)
+        if not args.skip_backend_check:
+            torch_model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device=device)
+            max_diff = check_backends_match(torch_model, model, sample_clips(args.video_path, num_clips=2))
+            print(f"ONNX Runtime matches torch (max probability difference: {max_diff:.2e})")
+            del torch_model
+    else:
+        model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device=device)
+    if args.backend != 'eager':
+        model = prepare_inference_model(model, args.backend, sample_clips(args.video_path))
+
+    if args.single_pass:
+        outputs = run_single_pass(args, model, device)
+    else:
+        outputs = run_pipeline(args, model, device)
+    raw_outputs, smoothed_outputs, raw_probs, smoothed_probs, timeline = outputs
+    if cache is not None:
+        cache.put(cache_key, raw_probs)
+    npz_paths = save_npz_outputs(args, raw_probs, smoothed_probs, timeline, per_frame) \
+        if args.output_format != 'json' else None
+
+    print_summary(args, device, raw_outputs, smoothed_outputs, npz_paths)
+
+def main(args):
+    profiler = profiling.enable(args.profile_trace) if args.profile or args.profile_trace else None
+    try:
+        run(args)
+    finally:
+        if profiler is not None:
+            profiling.disable()
+            if args.profile:
+                profiler.save(args.profile)
+            report = profiler.report()
+            peak_rss = f"{report['peak_rss_mb']:.0f} MB" if report['peak_rss_mb'] is not None else "unknown"
+            print(f"\nProfile ({report['wall_sec']:.2f} s, peak RSS {peak_rss}):")
+            for name, stats in report['stages'].items():
+                print(f"  {name:<12} {stats['total_sec']:8.3f} s  {stats['calls']:7d} calls")
+            for name, rate in report['rates'].items():
+                print(f"  {name}: {rate:.1f}")
 
 if __name__ == "__main__":
     args = parse_arguments()
@@ -0,0 +1,68 @@
+import json
+import argparse
+import torch
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+from src.train.model import load_trained_model
+from src.video.live import run_live_recognition
+from src.utils.utils import make_smoother, SMOOTHERS
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Live Video Action Recognition")
+
+    parser.add_argument('--checkpoint', type=str,
+                        default="./checkpoints/UCF101-filtered-lr0.0001-nobackgroundclass/model_e_10.pth",
+                        help="Path to model checkpoint")
+    parser.add_argument('--source', type=str,
+                        default="0",
+                        help="Device index, RTSP URL, pipe or video file")
+    parser.add_argument('--stride', type=int,
+                        default=CLIP_LENGTH,
+                        help="New frames between consecutive predictions")
+    parser.add_argument('--latency_budget', type=float,
+                        default=None,
+                        help="Skip frames older than this many seconds (no limit if not specified)")
+    parser.add_argument('--realtime', action=argparse.BooleanOptionalAction,
+                        default=None,
+                        help="Play file sources at their native fps (default: on for local files)")
+    parser.add_argument('--max_clips', type=int,
+                        default=None,
+                        help="Stop after this many predictions")
+    parser.add_argument('--smoother', type=str,
+                        default=None,
+                        choices=SMOOTHERS,
+                        help="Also report smoothed segments once they are final (none if not specified)")
+    parser.add_argument('--window_size', type=int,
+                        default=4,
+                        help="Smoothing window size (in predictions)")
+    parser.add_argument('--switch_penalty', type=float,
+                        default=2.0,
+                        help="Cost of a label change for --smoother viterbi (log-probability units)")
+    parser.add_argument('--device', type=str,
+                        default=None,
+                        choices=['cuda', 'cpu'],
+                        help="Force computation device (auto-detected if not specified)")
+
+    return parser.parse_args()
+
+def main(args):
+    device = torch.device(args.device if args.device else
+                         'cuda' if torch.cuda.is_available() else 'cpu')
+    model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device=device)
+
+    stats = run_live_recognition(
+        args.source, model, device, CLASS_NAMES,
+        clip_length=CLIP_LENGTH,
+        stride=args.stride,
+        latency_budget=args.latency_budget,
+        realtime=args.realtime,
+        max_clips=args.max_clips,
+        smoother=make_smoother(args.smoother, args.window_size, args.switch_penalty) if args.smoother else None
+    )
+
+    print("\nLive session finished:")
+    print(json.dumps(stats, indent=4))
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
@@ -0,0 +1,70 @@
+import argparse
+import torch
+
+from inference import CLASS_NAMES, CLIP_LENGTH
+from src.train.model import load_trained_model
+from src.video.server import ClipBatcher, make_server
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Video Action Recognition HTTP Server")
+
+    parser.add_argument('--checkpoint', type=str,
+                        default="./checkpoints/UCF101-filtered-lr0.0001-nobackgroundclass/model_e_10.pth",
+                        help="Path to model checkpoint")
+    parser.add_argument('--host', type=str,
+                        default="127.0.0.1",
+                        help="Address to listen on")
+    parser.add_argument('--port', type=int,
+                        default=8000,
+                        help="Port to listen on")
+    parser.add_argument('--max_batch_size', type=int,
+                        default=16,
+                        help="Maximum clips per forward pass, shared across requests")
+    parser.add_argument('--max_wait_ms', type=float,
+                        default=10.0,
+                        help="Time a clip may wait for other requests to fill the batch")
+    parser.add_argument('--max_queue', type=int,
+                        default=64,
+                        help="Clip blocks waiting for the model before new requests get 503")
+    parser.add_argument('--allow_paths', action='store_true',
+                        help="Accept paths of videos on the server instead of uploads only")
+    parser.add_argument('--max_upload_mb', type=float,
+                        default=512,
+                        help="Largest accepted video upload; larger requests get 413")
+    parser.add_argument('--threads', type=int,
+                        default=None,
+                        help="torch intra-op threads (torch default if not specified)")
+    parser.add_argument('--device', type=str,
+                        default=None,
+                        choices=['cuda', 'cpu'],
+                        help="Force computation device (auto-detected if not specified)")
+
+    return parser.parse_args()
+
+def main(args):
+    device = torch.device(args.device if args.device else
+                         'cuda' if torch.cuda.is_available() else 'cpu')
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    # Load the model once and warm it up before accepting requests
+    model = load_trained_model(args.checkpoint, num_classes=len(CLASS_NAMES), device=device)
+    batcher = ClipBatcher(model, device, max_batch_size=args.max_batch_size,
+                          max_wait=args.max_wait_ms / 1000, max_queue=args.max_queue)
+    batcher.warm_up(CLIP_LENGTH)
+    batcher.start()
+
+    server = make_server(batcher, CLASS_NAMES, args.host, args.port, CLIP_LENGTH, args.allow_paths,
+                         max_body_bytes=int(args.max_upload_mb * 2**20))
+    print(f"Serving on http://{args.host}:{server.server_port} (device: {device})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    main(args)
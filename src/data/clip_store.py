@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+import torch
+from torchvision.datasets import UCF101
+
+from src.data.ucf101_dataset import load_video_metadata, loader_options
+from src.video.video_process import resize_frames, preprocess_clips
+
+# Mantém os itens separados, pois o store grava clipe a clipe
+def _identity_collate(batch):
+    return batch
+
+def write_clip_store(dataset, store_path, num_workers=0):
+    """
+    Grava todos os clipes de um dataset em um arquivo memory-mapped.
+
+    Os clipes são gravados como uint8 já redimensionados (112x112), em um único
+    arquivo .npy que pode ser lido sem cópia com np.load(mmap_mode=...).
+
+    Parâmetros:
+    dataset (torch.utils.data.Dataset): Dataset que retorna (video, audio, label), com video
+        uint8 no formato (T, C, H, W) já redimensionado por resize_frames.
+    store_path (str): Diretório onde o store será criado.
+    num_workers (int): Número de processos para decodificar os vídeos.
+
+    Retorna:
+    str: Caminho do store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    loader = torch.utils.data.DataLoader(dataset, batch_size=16, shuffle=False,
+                                         num_workers=num_workers, collate_fn=_identity_collate)
+
+    clips = None
+    labels = np.empty(len(dataset), dtype=np.int64)
+    index = 0
+    for batch in loader:
+        for video, _, label in batch:
+            if clips is None:
+                clips = np.lib.format.open_memmap(os.path.join(store_path, "clips.npy"), mode='w+',
+                                                  dtype=np.uint8, shape=(len(dataset), *video.shape))
+            clips[index] = video.numpy()
+            labels[index] = label
+            index += 1
+
+    if clips is not None:
+        clips.flush()
+    np.save(os.path.join(store_path, "labels.npy"), labels)
+    with open(os.path.join(store_path, "index.json"), 'w') as f:
+        json.dump({'num_clips': index, 'clip_shape': list(clips.shape[1:]) if clips is not None else []}, f)
+    return store_path
+
+def build_ucf101_clip_store(data_path, annot_path, frames_per_clip, step_between_clips, store_path,
+                            train=True, num_workers=0, metadata_cache_path=None):
+    """
+    Decodifica uma vez os clipes do UCF101 e grava o store usado pelo ClipStoreDataset.
+
+    Parâmetros:
+    data_path (str): Caminho para o diretório do dataset.
+    annot_path (str): Caminho para o arquivo de anotações.
+    frames_per_clip (int): Número de frames por clipe.
+    step_between_clips (int): Passo entre clipes.
+    store_path (str): Diretório onde o store será criado.
+    train (bool): Se True, grava o conjunto de treino. Se False, o conjunto de teste.
+    num_workers (int): Número de processos para decodificar os vídeos.
+    metadata_cache_path (str): Arquivo de cache dos metadados dos vídeos (ver load_video_metadata).
+
+    Retorna:
+    str: Caminho do store.
+    """
+    metadata = load_video_metadata(data_path, frames_per_clip, step_between_clips,
+                                   cache_path=metadata_cache_path,
+                                   num_workers=max(1, num_workers))
+    dataset = UCF101(
+        root=data_path,
+        annotation_path=annot_path,
+        frames_per_clip=frames_per_clip,
+        step_between_clips=step_between_clips,
+        output_format="TCHW",
+        transform=resize_frames,
+        fold=1,
+        train=train,
+        _precomputed_metadata=metadata
+    )
+    return write_clip_store(dataset, store_path, num_workers=num_workers)
+
+class ClipStoreDataset(torch.utils.data.Dataset):
+    """
+    Dataset que lê os clipes de um store criado por write_clip_store.
+
+    Os clipes são lidos do arquivo memory-mapped sem cópia e retornados como uint8
+    (T, C, H, W). A normalização é feita por lote em clip_store_collate_fn.
+
+    Parâmetros:
+    store_path (str): Diretório do store.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        # Modo copy-on-write: leitura sem cópia, mas o array é gravável para o torch
+        self.clips = np.load(os.path.join(store_path, "clips.npy"), mmap_mode='c')
+        self.labels = np.load(os.path.join(store_path, "labels.npy"))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return torch.from_numpy(self.clips[idx]), int(self.labels[idx])
+
+# Empilha os clipes uint8 e normaliza o lote inteiro de uma vez
+def clip_store_collate_fn(batch):
+    clips = torch.stack([item[0] for item in batch])
+    labels = torch.tensor([item[1] for item in batch])
+    return preprocess_clips(clips), labels
+
+def load_clip_store(train_store_path, test_store_path, batch_size=35, test_batch_size=1, num_workers=0,
+                    prefetch_factor=None, persistent_workers=False, pin_memory=False):
+    """
+    Carrega os DataLoaders de treino e teste a partir de stores de clipes.
+
+    Parâmetros:
+    train_store_path (str): Store do conjunto de treino.
+    test_store_path (str): Store do conjunto de teste.
+    batch_size (int): Tamanho do batch de treino.
+    test_batch_size (int): Tamanho do batch de teste.
+    num_workers, prefetch_factor, persistent_workers, pin_memory: Paralelismo dos DataLoaders
+        (ver loader_options).
+
+    Retorna:
+    Tuple[DataLoader, DataLoader]: DataLoaders de treino e teste.
+    """
+    options = loader_options(num_workers, prefetch_factor, persistent_workers, pin_memory)
+    train_loader = torch.utils.data.DataLoader(
+        ClipStoreDataset(train_store_path),
+        batch_size=batch_size,
+        shuffle=True,
+        collate_fn=clip_store_collate_fn,
+        **options
+    )
+
+    test_loader = torch.utils.data.DataLoader(
+        ClipStoreDataset(test_store_path),
+        batch_size=test_batch_size,
+        shuffle=False,
+        collate_fn=clip_store_collate_fn,
+        **options
+    )
+
+    return train_loader, test_loader
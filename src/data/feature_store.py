@@ -0,0 +1,99 @@
+import os
+import json
+import numpy as np
+import torch
+
+from src.train.model import trunk_features
+
+def write_feature_store(model, dataloader, store_path, device='cpu', amp_dtype=None):
+    """
+    Passa o backbone congelado uma única vez pelo dataset e grava as features em um arquivo memory-mapped.
+
+    As features são a saída do avgpool do R3D_18 (512 valores por clipe), ou seja, a
+    entrada de model.fc. O backbone roda em modo eval (estatísticas do BatchNorm fixas),
+    como no treino com frozen_trunk=True.
+
+    Parâmetros:
+    model (torch.nn.Module): Modelo R3D_18 (ver load_new_model).
+    dataloader (DataLoader): DataLoader que retorna (inputs, labels) já normalizados, por
+        exemplo de load_ucf101_dataset ou load_clip_store.
+    store_path (str): Diretório onde o store será criado.
+    device (torch.device): Dispositivo usado no forward.
+    amp_dtype (torch.dtype): Se definido, roda o backbone com autocast nesse tipo (ex.: torch.bfloat16).
+
+    Retorna:
+    str: Caminho do store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    device = torch.device(device)
+    num_samples = len(dataloader.dataset)
+    features = np.lib.format.open_memmap(os.path.join(store_path, "features.npy"), mode='w+',
+                                         dtype=np.float32, shape=(num_samples, model.fc.in_features))
+    labels = np.empty(num_samples, dtype=np.int64)
+
+    model.eval()
+    index = 0
+    with torch.no_grad():
+        for inputs, batch_labels in dataloader:
+            with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=amp_dtype is not None):
+                batch_features = trunk_features(model, inputs.to(device))
+            features[index:index + len(batch_features)] = batch_features.float().cpu().numpy()
+            labels[index:index + len(batch_features)] = batch_labels.numpy()
+            index += len(batch_features)
+
+    features.flush()
+    np.save(os.path.join(store_path, "labels.npy"), labels[:index])
+    with open(os.path.join(store_path, "index.json"), 'w') as f:
+        json.dump({'num_samples': index, 'feature_dim': model.fc.in_features,
+                   'amp_dtype': str(amp_dtype).replace('torch.', '') if amp_dtype is not None else None}, f)
+    return store_path
+
+class FeatureStoreDataset(torch.utils.data.Dataset):
+    """
+    Dataset que lê as features de um store criado por write_feature_store.
+
+    Parâmetros:
+    store_path (str): Diretório do store.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.labels = np.load(os.path.join(store_path, "labels.npy"))
+        # Modo copy-on-write: leitura sem cópia, mas o array é gravável para o torch
+        self.features = np.load(os.path.join(store_path, "features.npy"), mmap_mode='c')[:len(self.labels)]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return torch.from_numpy(self.features[idx]), int(self.labels[idx])
+
+def load_feature_store(train_store_path, test_store_path, batch_size=256, test_batch_size=1024):
+    """
+    Carrega os DataLoaders de treino e teste a partir de stores de features.
+
+    Os lotes têm o formato (features, labels) e podem ser usados diretamente com
+    train_model(model.fc, ...) (ver train_linear_probe).
+
+    Parâmetros:
+    train_store_path (str): Store do conjunto de treino.
+    test_store_path (str): Store do conjunto de teste.
+    batch_size (int): Tamanho do batch de treino.
+    test_batch_size (int): Tamanho do batch de teste.
+
+    Retorna:
+    Tuple[DataLoader, DataLoader]: DataLoaders de treino e teste.
+    """
+    train_loader = torch.utils.data.DataLoader(
+        FeatureStoreDataset(train_store_path),
+        batch_size=batch_size,
+        shuffle=True
+    )
+
+    test_loader = torch.utils.data.DataLoader(
+        FeatureStoreDataset(test_store_path),
+        batch_size=test_batch_size,
+        shuffle=False
+    )
+
+    return train_loader, test_loader
@@ -1,5 +1,9 @@
+import os
+import time
 import torch
 from torchvision.datasets import UCF101
+from torchvision.datasets.folder import find_classes, make_dataset
+from torchvision.datasets.video_utils import VideoClips
 from torchvision.models.video import R3D_18_Weights
 
 # O dataset retorne video, audio, label
@@ -9,7 +13,136 @@ def collate_fn(batch):
     labels = [item[2] for item in batch]
     return torch.stack(inputs), torch.tensor(labels)
 
-def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_clips, batch_size=35):
+def loader_options(num_workers=0, prefetch_factor=None, persistent_workers=False, pin_memory=False):
+    """
+    Monta os argumentos de paralelismo do DataLoader.
+
+    prefetch_factor e persistent_workers só são repassados quando há workers,
+    pois o DataLoader não os aceita com num_workers=0.
+
+    Parâmetros:
+    num_workers (int): Número de processos para carregar os dados.
+    prefetch_factor (int): Batches pré-carregados por worker. Se None, usa o padrão do PyTorch.
+    persistent_workers (bool): Mantém os workers vivos entre épocas.
+    pin_memory (bool): Copia os batches para memória fixada (acelera a cópia para GPU).
+
+    Retorna:
+    dict: Argumentos para torch.utils.data.DataLoader.
+    """
+    options = {'num_workers': num_workers, 'pin_memory': pin_memory}
+    if num_workers > 0:
+        options['persistent_workers'] = persistent_workers
+        if prefetch_factor is not None:
+            options['prefetch_factor'] = prefetch_factor
+    return options
+
+def probe_loader_settings(dataset, batch_size, collate=collate_fn, worker_counts=None,
+                          prefetch_factors=(2, 4), num_batches=10, pin_memory=False):
+    """
+    Mede a vazão do DataLoader com diferentes configurações e retorna a mais rápida.
+
+    Parâmetros:
+    dataset (torch.utils.data.Dataset): Dataset a ser carregado.
+    batch_size (int): Tamanho do batch.
+    collate (Callable): Função de collate usada pelo DataLoader.
+    worker_counts (List[int]): Números de workers testados. Se None, usa 0, 2, 4, ... até o número de núcleos.
+    prefetch_factors (List[int]): Valores de prefetch_factor testados (quando há workers).
+    num_batches (int): Número de batches medidos em cada teste.
+    pin_memory (bool): Usa memória fixada nos testes.
+
+    Retorna:
+    Tuple[dict, List[dict]]: Melhor configuração (argumentos de loader_options) e resultados de todos os testes.
+    """
+    if worker_counts is None:
+        cores = os.cpu_count() or 1
+        worker_counts = [0] + [2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores]
+
+    results = []
+    for num_workers in worker_counts:
+        for prefetch_factor in (prefetch_factors if num_workers > 0 else [None]):
+            options = loader_options(num_workers, prefetch_factor, pin_memory=pin_memory)
+            loader = torch.utils.data.DataLoader(dataset, batch_size=batch_size, shuffle=True,
+                                                 collate_fn=collate, **options)
+            # O primeiro batch inclui a inicialização dos workers e não entra na medição
+            samples = 0
+            start = time.perf_counter()
+            for i, (inputs, _) in enumerate(loader):
+                if i == 0:
+                    start = time.perf_counter()
+                    continue
+                samples += inputs.size(0)
+                if i == num_batches:
+                    break
+            elapsed = time.perf_counter() - start
+            del loader  # Encerra os workers antes do próximo teste
+            results.append({**options, 'samples_per_sec': samples / elapsed})
+            print(f"num_workers={num_workers}, prefetch_factor={prefetch_factor}: {samples / elapsed:.1f} amostras/s")
+
+    best = max(results, key=lambda r: r['samples_per_sec'])
+    best = {k: v for k, v in best.items() if k != 'samples_per_sec'}
+    return best, results
+
+def load_video_metadata(data_path, frames_per_clip, step_between_clips, cache_path=None, num_workers=1):
+    """
+    Calcula os metadados de clipes (timestamps e fps) de todos os vídeos do dataset, com cache em disco.
+
+    Cada vídeo é identificado pelo caminho, tamanho, data de modificação, frames_per_clip
+    e step_between_clips. Apenas vídeos novos ou alterados são lidos novamente, em paralelo.
+
+    Parâmetros:
+    data_path (str): Caminho para o diretório do dataset.
+    frames_per_clip (int): Número de frames por clipe.
+    step_between_clips (int): Passo entre clipes.
+    cache_path (str): Arquivo de cache. Se None, usa '.video_metadata.pt' dentro de data_path.
+        Se o arquivo não puder ser gravado (diretório somente leitura), os metadados são
+        calculados normalmente, sem cache.
+    num_workers (int): Número de processos usados para ler os vídeos.
+
+    Retorna:
+    dict: Metadados no formato aceito por UCF101(_precomputed_metadata=...).
+    """
+    # Mesma lista e ordem de vídeos que o UCF101 monta internamente
+    data_path = os.path.expanduser(data_path)
+    _, class_to_idx = find_classes(data_path)
+    video_paths = [path for path, _ in make_dataset(data_path, class_to_idx, ("avi",))]
+
+    if cache_path is None:
+        cache_path = os.path.join(data_path, ".video_metadata.pt")
+    cache = torch.load(cache_path) if os.path.exists(cache_path) else {}
+
+    keys = {}
+    for path in video_paths:
+        stat = os.stat(path)
+        keys[path] = (stat.st_size, stat.st_mtime_ns, frames_per_clip, step_between_clips)
+    stale = [path for path in video_paths if path not in cache or tuple(cache[path]['key']) != keys[path]]
+
+    if stale:
+        clips = VideoClips(stale, frames_per_clip, step_between_clips, num_workers=num_workers)
+        for path, pts, fps in zip(stale, clips.video_pts, clips.video_fps):
+            cache[path] = {'key': list(keys[path]), 'pts': pts, 'fps': fps}
+
+        # Grava apenas os vídeos atuais, de forma atômica
+        cache = {path: cache[path] for path in video_paths}
+        tmp_path = cache_path + ".tmp"
+        try:
+            torch.save(cache, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except (OSError, RuntimeError) as e:
+            # Diretório somente leitura (ex.: dataset compartilhado): segue sem cache.
+            # torch.save reporta falhas de escrita como RuntimeError
+            print(f"Aviso: não foi possível gravar o cache de metadados em {cache_path} ({e})")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return {
+        "video_paths": video_paths,
+        "video_pts": [cache[path]['pts'] for path in video_paths],
+        "video_fps": [cache[path]['fps'] for path in video_paths],
+    }
+
+def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_clips, batch_size=35,
+                        metadata_cache_path=None, scan_workers=None, test_batch_size=1,
+                        num_workers=0, prefetch_factor=None, persistent_workers=False, pin_memory=False):
     """
     Carrega o dataset UCF101 com as transformações necessárias para o modelo R3D_18.
     
@@ -19,6 +152,11 @@ def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_cli
     frames_per_clip (int): Número de frames por clipe.
     step_between_clips (int): Passo entre clipes.
     train_dataset (bool): Se True, carrega o conjunto de treino. Se False, carrega o conjunto de teste.
+    metadata_cache_path (str): Arquivo de cache dos metadados dos vídeos (ver load_video_metadata).
+    scan_workers (int): Processos usados para ler os metadados. Se None, usa todos os núcleos.
+    test_batch_size (int): Tamanho do batch de teste.
+    num_workers, prefetch_factor, persistent_workers, pin_memory: Paralelismo dos DataLoaders
+        (ver loader_options e probe_loader_settings).
 
     Retorna:
     DataLoader: DataLoader para o dataset UCF101.
@@ -28,6 +166,11 @@ def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_cli
     weights = R3D_18_Weights.DEFAULT
     preprocess = weights.transforms()
 
+    # Metadados calculados uma vez e compartilhados entre treino e teste
+    metadata = load_video_metadata(data_path, frames_per_clip, step_between_clips,
+                                   cache_path=metadata_cache_path,
+                                   num_workers=scan_workers or os.cpu_count() or 1)
+
     train_dataset = UCF101(
         root=data_path,
         annotation_path=annot_path,
@@ -36,16 +179,18 @@ def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_cli
         output_format="TCHW",
         transform=preprocess,
         fold=1, # UCF101 original tem 3 folds, por usar uma versão customizada, usamos apenas o fold 1
-        train=True
+        train=True,
+        _precomputed_metadata=metadata
     )
 
     # DataLoader
+    options = loader_options(num_workers, prefetch_factor, persistent_workers, pin_memory)
     train_loader = torch.utils.data.DataLoader(
         train_dataset,
         batch_size=batch_size,
         shuffle=True,
-        num_workers=0, 
-        collate_fn=collate_fn
+        collate_fn=collate_fn,
+        **options
     )
 
     test_dataset = UCF101(
@@ -56,16 +201,17 @@ def load_ucf101_dataset(data_path, annot_path, frames_per_clip, step_between_cli
         output_format="TCHW",
         transform=preprocess,
         fold=1,
-        train=False
+        train=False,
+        _precomputed_metadata=metadata
     )
 
     # DataLoader
     test_loader = torch.utils.data.DataLoader(
         test_dataset,
-        batch_size=1,
+        batch_size=test_batch_size,
         shuffle=False,
-        num_workers=0, 
-        collate_fn=collate_fn
+        collate_fn=collate_fn,
+        **options
     )
 
     return train_loader, test_loader
\ No newline at end of file
@@ -1,103 +1,256 @@
+import os
+import json
 import torch
 import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, classification_report
+from sklearn.metrics import classification_report
 import seaborn as sns
 from collections import defaultdict
 
-def evaluate_model(model, test_loader, device, class_names):
+from src.utils.profiling import stage, count, timed_iter
+
+def evaluation_metrics(labels, preds, confidences, num_classes, num_bins=20):
     """
-    Valida o modelo em um conjunto de teste e gera relatórios de desempenho.
+    Calcula as métricas de avaliação com operações vetorizadas sobre os tensores.
 
     Parâmetros:
-    model (torch.nn.Module): O modelo treinado.
-    test_loader (torch.utils.data.DataLoader): DataLoader para o conjunto de teste.
-    device (torch.device): Dispositivo para computação (CPU ou GPU).
+    labels (torch.Tensor): Rótulos verdadeiros, shape (N,).
+    preds (torch.Tensor): Classes previstas, shape (N,).
+    confidences (torch.Tensor): Probabilidade da classe prevista, shape (N,).
+    num_classes (int): Número de classes.
+    num_bins (int): Número de intervalos do histograma de confiança, entre 0 e 1.
+
+    Retorna:
+    dict: Acurácia geral (%), matriz de confusão (linhas = real, colunas = previsto),
+        acertos, total e acurácia (%) por classe e o histograma de confiança
+        (contagens e limites dos intervalos).
+    """
+    cm = torch.bincount(labels * num_classes + preds, minlength=num_classes * num_classes)
+    cm = cm.view(num_classes, num_classes)
+    per_class_total = cm.sum(dim=1)
+    per_class_correct = cm.diagonal()
+    # Classes sem amostras no teste ficam com acurácia NaN
+    per_class_accuracy = 100 * per_class_correct.double() / per_class_total.double()
+    histogram = torch.histc(confidences.float(), bins=num_bins, min=0.0, max=1.0)
+
+    return {
+        'accuracy': 100 * per_class_correct.sum().item() / max(len(labels), 1),
+        'total': len(labels),
+        'confusion_matrix': cm,
+        'per_class_correct': per_class_correct,
+        'per_class_total': per_class_total,
+        'per_class_accuracy': per_class_accuracy,
+        'confidence_histogram': histogram.long(),
+        'confidence_bin_edges': torch.linspace(0.0, 1.0, num_bins + 1),
+    }
+
+def plot_evaluation(metrics, class_names, output_dir=None, show=False):
+    """
+    Plota a matriz de confusão, a acurácia por classe e o histograma de confiança.
+
+    Parâmetros:
+    metrics (dict): Saída de evaluation_metrics.
     class_names (list): Lista de nomes das classes.
+    output_dir (str): Se definido, salva confusion_matrix.png, per_class_accuracy.png e
+        confidence_histogram.png nesse diretório.
+    show (bool): Se True, exibe as figuras com plt.show().
+
+    Retorna:
+    list: Caminhos das imagens salvas.
     """
-    model.eval()
-    
-    # Inicializa variáveis para armazenar resultados
-    all_preds = []
-    all_labels = []
-    correct = 0
-    total = 0
-    per_class_correct = defaultdict(int)
-    per_class_total = defaultdict(int)
-    confidence_scores = []
-    
-    with torch.no_grad(): # Garante que não calculamos gradientes
-        for inputs, labels in test_loader:
-            inputs = inputs.to(device)
-            labels = labels.to(device)
-            
-            # Forward pass
-            outputs = model(inputs)
-            probabilities = torch.nn.functional.softmax(outputs, dim=1)
-            _, predicted = torch.max(outputs.data, 1)
-            max_probs, _ = torch.max(probabilities, 1)
-            
-            # Atualiza métricas
-            total += labels.size(0)
-            correct += (predicted == labels).sum().item()
-            
-            # Armazena previsões e rótulos
-            all_preds.extend(predicted.cpu().numpy())
-            all_labels.extend(labels.cpu().numpy())
-            confidence_scores.extend(max_probs.cpu().numpy())
-            
-            # Métricas por classe
-            for lbl, pred, prob in zip(labels, predicted, max_probs):
-                per_class_total[lbl.item()] += 1
-                if lbl == pred:
-                    per_class_correct[lbl.item()] += 1
-    
-    accuracy = 100 * correct / total
-    print(f"\nOverall Accuracy: {accuracy:.2f}%")
-    print(f"Total Test Samples: {total}")
-    
-    print("\nClassification Report:")
-    print(classification_report(all_labels, all_preds, target_names=class_names, digits=4))
-    
-    # Plot confusion matrix
+    paths = []
+
+    def finish(name):
+        plt.tight_layout()
+        if output_dir is not None:
+            paths.append(os.path.join(output_dir, f"{name}.png"))
+            plt.savefig(paths[-1], dpi=100)
+        if show:
+            plt.show()
+        plt.close()
+
     plt.figure(figsize=(12, 10))
-    cm = confusion_matrix(all_labels, all_preds)
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
+    sns.heatmap(metrics['confusion_matrix'].numpy(), annot=True, fmt='d', cmap='Blues',
                 xticklabels=class_names, yticklabels=class_names)
     plt.title('Confusion Matrix')
     plt.xlabel('Predicted')
     plt.ylabel('Actual')
     plt.xticks(rotation=45)
     plt.yticks(rotation=0)
-    plt.tight_layout()
-    plt.show()
-    
-    # Plot per-class accuracy
-    class_accuracies = []
-    for class_id in sorted(per_class_total.keys()):
-        acc = 100 * per_class_correct[class_id] / per_class_total[class_id]
-        class_accuracies.append(acc)
-    
+    finish('confusion_matrix')
+
     plt.figure(figsize=(12, 6))
-    plt.bar(range(len(class_names)), class_accuracies, color='skyblue')
+    plt.bar(range(len(class_names)), metrics['per_class_accuracy'].nan_to_num(0.0).numpy(), color='skyblue')
     plt.xticks(range(len(class_names)), class_names, rotation=45)
     plt.title('Per-Class Accuracy')
     plt.ylabel('Accuracy (%)')
     plt.ylim(0, 100)
-    plt.tight_layout()
-    plt.show()
-    
+    finish('per_class_accuracy')
+
+    # Histograma já contado em evaluation_metrics, plotado como barras
+    edges = metrics['confidence_bin_edges'].numpy()
     plt.figure(figsize=(10, 6))
-    plt.hist(confidence_scores, bins=20, color='purple', alpha=0.7)
+    plt.bar(edges[:-1], metrics['confidence_histogram'].numpy(), width=edges[1] - edges[0],
+            align='edge', color='purple', alpha=0.7)
     plt.title('Distribution of Prediction Confidence Scores')
     plt.xlabel('Confidence Score')
     plt.ylabel('Frequency')
     plt.grid(True, alpha=0.3)
-    plt.show()
-    
+    finish('confidence_histogram')
+
+    return paths
+
+def evaluate_model(model, test_loader, device, class_names, output_dir=None, show=None,
+                   amp_dtype=None, num_bins=20):
+    """
+    Valida o modelo em um conjunto de teste e gera relatórios de desempenho.
+
+    As previsões de cada batch são acumuladas em tensores e as métricas são calculadas
+    de uma vez no final (ver evaluation_metrics), então o custo é dominado pelo forward;
+    use um test_batch_size grande (ex.: load_ucf101_dataset(..., test_batch_size=32)).
+    Com output_dir, a avaliação roda sem interface gráfica: as métricas vão para
+    evaluation.json e os gráficos para arquivos PNG.
+
+    Parâmetros:
+    model (torch.nn.Module): O modelo treinado.
+    test_loader (torch.utils.data.DataLoader): DataLoader para o conjunto de teste.
+    device (torch.device): Dispositivo para computação (CPU ou GPU).
+    class_names (list): Lista de nomes das classes.
+    output_dir (str): Diretório onde salvar evaluation.json e os gráficos em PNG.
+    show (bool): Se True, exibe os gráficos com plt.show(). Por padrão, exibe apenas
+        quando output_dir não é definido.
+    amp_dtype (torch.dtype): Se definido, roda o forward com autocast nesse tipo (ex.: torch.bfloat16).
+    num_bins (int): Número de intervalos do histograma de confiança.
+
+    Retorna:
+    Tuple[float, numpy.ndarray]: Acurácia geral (%) e matriz de confusão.
+    """
+    if show is None:
+        show = output_dir is None
+    device = torch.device(device)
+    model.eval()
+
+    # Resultados de cada batch, concatenados no final
+    all_preds = []
+    all_labels = []
+    confidence_scores = []
+
+    with torch.no_grad(): # Garante que não calculamos gradientes
+        for inputs, labels in timed_iter(test_loader, 'data'):
+            inputs = inputs.to(device)
+
+            # Forward pass
+            with stage('forward'), torch.autocast(device_type=device.type, dtype=amp_dtype,
+                                                  enabled=amp_dtype is not None):
+                outputs = model(inputs)
+            count('samples', labels.size(0))
+            max_probs, predicted = torch.nn.functional.softmax(outputs.float(), dim=1).max(dim=1)
+
+            all_preds.append(predicted.cpu())
+            all_labels.append(labels.cpu())
+            confidence_scores.append(max_probs.cpu())
+
+    all_preds = torch.cat(all_preds)
+    all_labels = torch.cat(all_labels)
+    metrics = evaluation_metrics(all_labels, all_preds, torch.cat(confidence_scores),
+                                 len(class_names), num_bins)
+    accuracy = metrics['accuracy']
+    cm = metrics['confusion_matrix'].numpy()
+
+    print(f"\nOverall Accuracy: {accuracy:.2f}%")
+    print(f"Total Test Samples: {metrics['total']}")
+
+    print("\nClassification Report:")
+    report_args = dict(y_true=all_labels.numpy(), y_pred=all_preds.numpy(), labels=range(len(class_names)),
+                       target_names=class_names, digits=4, zero_division=0)
+    print(classification_report(**report_args))
+    report = classification_report(**report_args, output_dict=True)
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    plot_paths = plot_evaluation(metrics, class_names, output_dir, show)
+
     # Calculate and print class-wise metrics
     print("\nClass-wise Performance:")
-    for class_id in sorted(per_class_total.keys()):
-        acc = 100 * per_class_correct[class_id] / per_class_total[class_id]
-        print(f"{class_names[class_id]:<15}: {per_class_correct[class_id]}/{per_class_total[class_id]} = {acc:.2f}%")
-    
-    return accuracy, cm
\ No newline at end of file
+    for class_id, name in enumerate(class_names):
+        correct, total = metrics['per_class_correct'][class_id].item(), metrics['per_class_total'][class_id].item()
+        if total:
+            print(f"{name:<15}: {correct}/{total} = {metrics['per_class_accuracy'][class_id].item():.2f}%")
+
+    if output_dir is not None:
+        results = {
+            'accuracy': accuracy,
+            'total': metrics['total'],
+            'class_names': list(class_names),
+            'confusion_matrix': cm.tolist(),
+            'per_class': {
+                name: {
+                    'correct': metrics['per_class_correct'][class_id].item(),
+                    'total': metrics['per_class_total'][class_id].item(),
+                    'accuracy': metrics['per_class_accuracy'][class_id].item()
+                        if metrics['per_class_total'][class_id] else None,
+                }
+                for class_id, name in enumerate(class_names)
+            },
+            'classification_report': report,
+            'confidence_histogram': {
+                'counts': metrics['confidence_histogram'].tolist(),
+                'bin_edges': metrics['confidence_bin_edges'].tolist(),
+            },
+            'plots': [os.path.basename(path) for path in plot_paths],
+        }
+        with open(os.path.join(output_dir, "evaluation.json"), 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResultados salvos em {output_dir}")
+
+    return accuracy, cm
+
+
+def compare_inference_backends(reference_model, backend_models, test_loader, device='cpu'):
+    """
+    Compara backends de inferência com o modelo float de referência no conjunto de teste.
+
+    Parâmetros:
+    reference_model (torch.nn.Module): Modelo float original.
+    backend_models (dict): Nome do backend -> modelo convertido (ver prepare_inference_model).
+    test_loader (torch.utils.data.DataLoader): DataLoader para o conjunto de teste.
+    device (torch.device): Dispositivo para computação.
+
+    Retorna:
+    dict: Para cada backend (e 'float'), acurácia, diferença de acurácia para o float,
+        concordância das predições com o float e maior diferença absoluta de probabilidade.
+    """
+    models = {'float': reference_model.eval(), **backend_models}
+    correct = defaultdict(int)
+    agree = defaultdict(int)
+    max_prob_diff = defaultdict(float)
+    total = 0
+
+    with torch.no_grad():
+        for inputs, labels in test_loader:
+            inputs = inputs.to(device)
+            labels = labels.to(device)
+            reference = torch.nn.functional.softmax(models['float'](inputs), dim=1)
+            reference_preds = reference.argmax(dim=1)
+            total += labels.size(0)
+
+            for name, model in models.items():
+                probs = reference if name == 'float' else torch.nn.functional.softmax(model(inputs), dim=1)
+                preds = probs.argmax(dim=1)
+                correct[name] += (preds == labels).sum().item()
+                agree[name] += (preds == reference_preds).sum().item()
+                max_prob_diff[name] = max(max_prob_diff[name], (probs - reference).abs().max().item())
+
+    float_accuracy = 100 * correct['float'] / total
+    results = {}
+    for name in models:
+        accuracy = 100 * correct[name] / total
+        results[name] = {
+            'accuracy': accuracy,
+            'accuracy_diff': accuracy - float_accuracy,
+            'agreement': 100 * agree[name] / total,
+            'max_prob_diff': max_prob_diff[name],
+        }
+        print(f"{name:<15}: acc={accuracy:.2f}% ({accuracy - float_accuracy:+.2f}) "
+              f"concordância={results[name]['agreement']:.2f}% max|Δp|={max_prob_diff[name]:.4f}")
+    return results
+
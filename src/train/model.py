@@ -1,10 +1,13 @@
+import copy
 import torch
-import torchvision
 from torch import nn, optim
-from torchvision.models.video import R3D_18_Weights
 
 def load_new_model(num_classes, pretrained=True, device='cuda', freeze_params=True):
     """Load the pretrained model with the specified number of classes."""
+    # torchvision is imported here so that loading a trained model does not pay for it up front
+    import torchvision
+    from torchvision.models.video import R3D_18_Weights
+
     # Load pretrained model
     if pretrained:
         model = torchvision.models.video.r3d_18(weights=R3D_18_Weights.DEFAULT)
@@ -28,4 +31,108 @@ def load_new_model(num_classes, pretrained=True, device='cuda', freeze_params=Tr
 
     model = model.to(device)
 
-    return model
\ No newline at end of file
+    return model
+
+def trunk_features(model, inputs):
+    """Run R3D_18 up to the pooled features that feed the classifier (model.fc)."""
+    x = model.stem(inputs)
+    x = model.layer1(x)
+    x = model.layer2(x)
+    x = model.layer3(x)
+    x = model.layer4(x)
+    x = model.avgpool(x)
+    return x.flatten(1)
+
+def set_trunk_frozen(model):
+    """
+    Put every layer except the classifier in eval mode, so frozen BatchNorm statistics
+    stay fixed while the classifier trains. All trunk parameters must be frozen.
+    """
+    if any(p.requires_grad for name, p in model.named_parameters() if not name.startswith('fc.')):
+        raise ValueError("frozen_trunk needs a model loaded with freeze_params=True")
+    for name, module in model.named_children():
+        if name != 'fc':
+            module.eval()
+
+def load_trained_model(checkpoint_path, num_classes, device='cuda'):
+    """
+    Build the model, load the trained weights from a checkpoint and set it to eval mode.
+
+    The checkpoint replaces every weight, so the architecture is built on the meta
+    device (no Kinetics-400 download and no random initialization) and the
+    memory-mapped checkpoint tensors are assigned to it directly.
+    """
+    state_dict = torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=True)
+    with torch.device('meta'):
+        model = load_new_model(num_classes=num_classes, pretrained=False,
+                               device='meta', freeze_params=True)
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    model.to(device)
+    return model
+
+
+INFERENCE_BACKENDS = ('eager', 'channels_last', 'dynamic_int8', 'static_int8', 'torchscript', 'compile')
+
+class _ChannelsLast3d(nn.Module):
+    """Run a channels-last-3d model, converting its inputs to the same memory format."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last_3d)
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last_3d))
+
+def prepare_inference_model(model, backend='eager', example_inputs=None):
+    """
+    Convert a trained float model into a CPU inference backend.
+
+    Backends:
+        eager: the float model unchanged.
+        channels_last: float model with channels-last-3d weights and inputs.
+        dynamic_int8: int8 dynamic quantization (only affects the final linear layer of R3D_18).
+        static_int8: int8 static quantization of the convolutions (FX graph mode),
+            calibrated on `example_inputs`.
+        torchscript: traced and frozen TorchScript module.
+        compile: torch.compile.
+
+    Args:
+        model (torch.nn.Module): Trained float model.
+        backend (str): One of INFERENCE_BACKENDS.
+        example_inputs (torch.Tensor): Preprocessed clips (N, C, T, H, W) used for tracing and
+            calibration. Random clips are used if None, which is enough for tracing but gives
+            a poor int8 calibration.
+
+    Returns:
+        torch.nn.Module: Model in eval mode for the selected backend.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {INFERENCE_BACKENDS}")
+
+    model = model.cpu().eval()
+    if example_inputs is None:
+        example_inputs = torch.randn(2, 3, 16, 112, 112)
+
+    if backend == 'eager':
+        return model
+    if backend == 'channels_last':
+        # .to(memory_format=...) converts the parameters in place, so work on a copy
+        return _ChannelsLast3d(copy.deepcopy(model)).eval()
+    if backend == 'dynamic_int8':
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    if backend == 'static_int8':
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+        qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+        prepared = prepare_fx(copy.deepcopy(model), qconfig_mapping, (example_inputs[:1],))
+        with torch.no_grad():
+            for batch in example_inputs.split(8):
+                prepared(batch)
+        return convert_fx(prepared).eval()
+    if backend == 'torchscript':
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example_inputs[:1])
+        return torch.jit.freeze(traced)
+    return torch.compile(model)
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import torch
+
+def export_onnx(model, onnx_path, clip_length=16, crop_size=112):
+    """
+    Export the model to ONNX with a dynamic batch dimension.
+
+    Args:
+        model (torch.nn.Module): Trained model (see load_trained_model).
+        onnx_path (str): Output .onnx file.
+        clip_length (int): Number of frames per clip.
+        crop_size (int): Height and width of the input frames.
+
+    Returns:
+        str: Path of the exported model.
+    """
+    model = model.cpu().eval()
+    example = torch.randn(1, 3, clip_length, crop_size, crop_size)
+    os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+    torch.onnx.export(
+        model,
+        (example,),
+        onnx_path,
+        input_names=['clips'],
+        output_names=['logits'],
+        dynamic_axes={'clips': {0: 'batch'}, 'logits': {0: 'batch'}}
+    )
+    return onnx_path
+
+class OnnxRuntimeModel:
+    """
+    ONNX Runtime session with the calling convention of the torch model.
+
+    It takes and returns torch tensors, so it can be passed as `model` to
+    classify_video and classify_and_annotate_video.
+
+    Args:
+        onnx_path (str): Model exported with export_onnx.
+        intra_op_threads (int): Threads used inside each operator (ORT default if None).
+        inter_op_threads (int): Threads used to run independent operators (ORT default if None).
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=None, inter_op_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, clips):
+        inputs = clips.detach().cpu().numpy().astype(np.float32, copy=False)
+        logits = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+def check_backends_match(torch_model, onnx_model, clips, atol=1e-4):
+    """
+    Check that the torch and ONNX Runtime models give the same probabilities.
+
+    Args:
+        torch_model (torch.nn.Module): Reference model.
+        onnx_model (OnnxRuntimeModel): ONNX Runtime model.
+        clips (torch.Tensor): Preprocessed clips (N, C, T, H, W).
+        atol (float): Maximum allowed absolute difference of the probabilities.
+
+    Returns:
+        float: Maximum absolute difference of the probabilities.
+    """
+    device = next(torch_model.parameters()).device
+    with torch.no_grad():
+        torch_probs = torch.nn.functional.softmax(torch_model(clips.to(device)), dim=1).cpu()
+    onnx_probs = torch.nn.functional.softmax(onnx_model(clips), dim=1)
+    max_diff = (torch_probs - onnx_probs).abs().max().item()
+    if max_diff > atol:
+        raise ValueError(f"ONNX Runtime probabilities differ from torch by {max_diff:.2e} (tolerance {atol:.0e})")
+    return max_diff
@@ -1,28 +1,62 @@
 import os
 import json
+import time
 import torch
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 
-def train_epoch(model, dataloader, criterion, optimizer, device, epoch, num_epochs):
-    """Perform one training epoch"""
+from src.train.model import trunk_features, set_trunk_frozen
+from src.utils.profiling import stage, count, timed_iter
+
+def _forward(model, inputs, frozen_trunk):
+    """Run the model, keeping the frozen trunk out of autograd if requested"""
+    if not frozen_trunk:
+        return model(inputs)
+    with torch.no_grad():
+        features = trunk_features(model, inputs)
+    return model.fc(features)
+
+def train_epoch(model, dataloader, criterion, optimizer, device, epoch, num_epochs,
+                amp_dtype=None, accumulation_steps=1, frozen_trunk=False, throughput=None):
+    """Perform one training epoch, filling the optional throughput dict with samples/sec and step time"""
     model.train()
+    if frozen_trunk:
+        set_trunk_frozen(model)
+    device = torch.device(device)
+    # float16 needs loss scaling to avoid gradient underflow, bfloat16 does not
+    scaler = torch.amp.GradScaler(device.type, enabled=amp_dtype == torch.float16)
     running_loss = 0.0
     running_corrects = 0
     total_samples = 0
+    step_time = 0.0
+    epoch_start = time.perf_counter()
     
+    # The last optimizer step may accumulate fewer batches than accumulation_steps
+    num_batches = len(dataloader)
+    last_group_start = num_batches - (num_batches % accumulation_steps or accumulation_steps)
+    
+    optimizer.zero_grad()
     progress_bar = tqdm(dataloader, desc=f'Epoch {epoch+1}/{num_epochs} [Train]', leave=False)
-    for inputs, labels in progress_bar:
+    for i, (inputs, labels) in enumerate(timed_iter(progress_bar, 'data')):
+        step_start = time.perf_counter()
         inputs, labels = inputs.to(device), labels.to(device)
         
         # Forward pass
-        optimizer.zero_grad()
-        outputs = model(inputs)
-        loss = criterion(outputs, labels)
+        with stage('forward'), torch.autocast(device_type=device.type, dtype=amp_dtype,
+                                              enabled=amp_dtype is not None):
+            outputs = _forward(model, inputs, frozen_trunk)
+            loss = criterion(outputs, labels)
         
-        # Backward pass
-        loss.backward()
-        optimizer.step()
+        # Backward pass, stepping once every accumulation_steps batches
+        group_size = accumulation_steps if i < last_group_start else num_batches - last_group_start
+        with stage('backward'):
+            scaler.scale(loss / group_size).backward()
+        if (i + 1) % accumulation_steps == 0 or i + 1 == num_batches:
+            with stage('optimizer'):
+                scaler.step(optimizer)
+                scaler.update()
+                optimizer.zero_grad()
+        count('samples', inputs.size(0))
         
         # Statistics
         _, preds = torch.max(outputs, 1)
@@ -32,6 +66,7 @@ def train_epoch(model, dataloader, criterion, optimizer, device, epoch, num_epoc
         running_loss += loss.item() * batch_total
         running_corrects += batch_correct
         total_samples += batch_total
+        step_time += time.perf_counter() - step_start  # loss.item() waited for the device
         
         # Update progress bar
         progress_bar.set_postfix({
@@ -41,11 +76,15 @@ def train_epoch(model, dataloader, criterion, optimizer, device, epoch, num_epoc
     
     epoch_loss = running_loss / total_samples
     epoch_acc = (running_corrects.double() / total_samples).cpu().numpy().item()
+    if throughput is not None:
+        throughput['samples_per_sec'] = total_samples / (time.perf_counter() - epoch_start)
+        throughput['step_time_sec'] = step_time / num_batches
     return epoch_loss, epoch_acc
 
-def validate(model, dataloader, criterion, device, epoch, num_epochs):
+def validate(model, dataloader, criterion, device, epoch, num_epochs, amp_dtype=None):
     """Perform validation on test set"""
     model.eval()
+    device = torch.device(device)
     running_loss = 0.0
     running_corrects = 0
     total_samples = 0
@@ -56,8 +95,9 @@ def validate(model, dataloader, criterion, device, epoch, num_epochs):
             inputs, labels = inputs.to(device), labels.to(device)
             
             # Forward pass
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
+            with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=amp_dtype is not None):
+                outputs = model(inputs)
+                loss = criterion(outputs, labels)
             
             # Statistics
             _, preds = torch.max(outputs, 1)
@@ -108,8 +148,21 @@ def plot_metrics(metrics):
     plt.show()
 
 def train_model(model, train_loader, test_loader, criterion, optimizer, device, 
-                num_epochs=25, save_path='./model_checkpoints'):
-    """Main training function with metrics logging"""
+                num_epochs=25, save_path='./model_checkpoints',
+                amp_dtype=None, accumulation_steps=1, frozen_trunk=False,
+                checkpoint_model=None, plot=True):
+    """
+    Main training function with metrics logging
+
+    amp_dtype runs the forward pass under autocast (torch.bfloat16 on CPU, torch.float16
+    or torch.bfloat16 on CUDA), accumulation_steps sums the gradients of several batches
+    per optimizer step, and frozen_trunk (for models from load_new_model with
+    freeze_params=True) runs the frozen layers without autograd and with fixed
+    BatchNorm statistics, so only the classifier is trained. checkpoint_model is the
+    module saved each epoch (defaults to model), and plot=False skips the plots.
+    """
+    if checkpoint_model is None:
+        checkpoint_model = model
     os.makedirs(save_path, exist_ok=True)
     
     metrics = {
@@ -122,7 +175,14 @@ def train_model(model, train_loader, test_loader, criterion, optimizer, device,
             'num_epochs': num_epochs,
             'optimizer': optimizer.__class__.__name__,
             'learning_rate': optimizer.param_groups[0]['lr'],
-            'device': str(device)
+            'device': str(device),
+            'batch_size': train_loader.batch_size,
+            'accumulation_steps': accumulation_steps,
+            'effective_batch_size': train_loader.batch_size * accumulation_steps,
+            'amp_dtype': str(amp_dtype).replace('torch.', '') if amp_dtype is not None else None,
+            'frozen_trunk': frozen_trunk,
+            'train_samples_per_sec': [],
+            'train_step_time_sec': []
         }
     }
     
@@ -130,13 +190,16 @@ def train_model(model, train_loader, test_loader, criterion, optimizer, device,
     
     for epoch in range(num_epochs):
         # Training
+        throughput = {}
         train_loss, train_acc = train_epoch(
-            model, train_loader, criterion, optimizer, device, epoch, num_epochs
+            model, train_loader, criterion, optimizer, device, epoch, num_epochs,
+            amp_dtype=amp_dtype, accumulation_steps=accumulation_steps, frozen_trunk=frozen_trunk,
+            throughput=throughput
         )
         
         # Validation
         test_loss, test_acc = validate(
-            model, test_loader, criterion, device, epoch, num_epochs
+            model, test_loader, criterion, device, epoch, num_epochs, amp_dtype=amp_dtype
         )
         
         # Update metrics
@@ -144,9 +207,11 @@ def train_model(model, train_loader, test_loader, criterion, optimizer, device,
         metrics['train_acc'].append(float(train_acc))
         metrics['test_loss'].append(float(test_loss))
         metrics['test_acc'].append(float(test_acc))
+        metrics['config']['train_samples_per_sec'].append(throughput['samples_per_sec'])
+        metrics['config']['train_step_time_sec'].append(throughput['step_time_sec'])
         
         # Save checkpoint
-        torch.save(model.state_dict(), os.path.join(save_path, f'model_e_{epoch+1}.pth'))
+        torch.save(checkpoint_model.state_dict(), os.path.join(save_path, f'model_e_{epoch+1}.pth'))
         
         # Update best accuracy
         if test_acc > best_test_acc:
@@ -156,12 +221,30 @@ def train_model(model, train_loader, test_loader, criterion, optimizer, device,
         
         # Epoch summary
         print(f'\nEpoch {epoch+1}/{num_epochs}')
-        print(f'Train Loss: {train_loss:.4f} | Acc: {train_acc:.4f}')
+        print(f'Train Loss: {train_loss:.4f} | Acc: {train_acc:.4f} | '
+              f'{throughput["samples_per_sec"]:.1f} samples/s')
         print(f'Test Loss:  {test_loss:.4f} | Acc: {test_acc:.4f}')
         print('-' * 60)
     
         # Save metrics and plot
         save_metrics(metrics, save_path)
-        plot_metrics(metrics)
+        if plot:
+            plot_metrics(metrics)
     
+    return model, metrics
+
+def train_linear_probe(model, train_loader, test_loader, criterion, optimizer, device,
+                       num_epochs=25, save_path='./model_checkpoints', plot=True):
+    """
+    Train only the classifier (model.fc) from cached backbone features
+
+    The loaders come from src.data.feature_store.load_feature_store and the optimizer
+    must hold model.fc's parameters. Checkpoints hold the whole model, so they load
+    with load_trained_model like any other.
+    """
+    model.fc.to(device)
+    _, metrics = train_model(model.fc, train_loader, test_loader, criterion, optimizer, device,
+                             num_epochs=num_epochs, save_path=save_path, checkpoint_model=model, plot=plot)
+    metrics['config']['linear_probe'] = True
+    save_metrics(metrics, save_path)
     return model, metrics
\ No newline at end of file
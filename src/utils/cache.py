@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+HASH_INDEX = "file_hashes.json"
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ProbabilityCache:
+    """
+    On-disk cache of the raw clip probabilities of a video.
+
+    Entries are keyed by the content hash of the video, the hash of the model file and
+    the settings that change the probabilities (clip length, step, backend, ...), so a
+    renamed video still hits and a new checkpoint never does. File hashes are memoized
+    by path, size and modification time, so an unchanged video is read only once.
+    When the cache grows past `max_bytes`, the least recently used entries are removed,
+    together with the memoized hashes of files no remaining entry was built from.
+
+    Args:
+        cache_dir (str): Directory holding the cache.
+        max_bytes (int): Maximum total size of the cached arrays.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path = os.path.join(cache_dir, HASH_INDEX)
+        try:
+            with open(index_path) as f:
+                self._hashes = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._hashes = {}
+
+    def file_hash(self, path):
+        """Return the SHA-256 of a file, reusing the stored value while the file is unchanged."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        entry = self._hashes.get(path)
+        if entry is not None and entry['stamp'] == stamp:
+            return entry['sha256']
+        digest = _sha256(path)
+        self._hashes[path] = {'stamp': stamp, 'sha256': digest, 'keys': []}
+        self._save_index()
+        return digest
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, HASH_INDEX)
+        with open(index_path + ".tmp", 'w') as f:
+            json.dump(self._hashes, f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def key(self, video_path, model_path, **settings):
+        """
+        Build the cache key of a video processed by a model.
+
+        Args:
+            video_path (str): Path to the input video.
+            model_path (str): Checkpoint (or exported model) producing the probabilities.
+            **settings: Any other value the probabilities depend on, e.g. clip_length and step.
+
+        Returns:
+            str: Hex key.
+        """
+        fields = {'video': self.file_hash(video_path), 'model': self.file_hash(model_path), **settings}
+        key = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+        # Remember which entries each file was used for, so evict() can drop its hash
+        for path in (video_path, model_path):
+            keys = self._hashes[os.path.abspath(path)].setdefault('keys', [])
+            if key not in keys:
+                keys.append(key)
+        return key
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Return the cached probabilities, or None on a miss."""
+        path = self._path(key)
+        try:
+            probs = np.load(path)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # Mark as recently used
+        return probs
+
+    def put(self, key, probs):
+        """Store the probabilities and evict the least recently used entries if needed."""
+        path = self._path(key)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, np.asarray(probs))
+        os.replace(tmp_path, path)
+        self._save_index()
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy") and not name.endswith(".tmp.npy"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue  # Removed by another process
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = set()
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            removed.add(name[:-len(".npy")])
+            total -= size
+        if not removed:
+            return
+
+        # Forget the hashes of files whose last cached entry was just removed
+        remaining = {name[:-len(".npy")] for _, _, name in entries} - removed
+        for path, entry in list(self._hashes.items()):
+            keys = entry.get('keys', [])
+            if removed.intersection(keys):
+                entry['keys'] = [key for key in keys if key in remaining]
+                if not entry['keys']:
+                    del self._hashes[path]
+        self._save_index()
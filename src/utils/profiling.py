@@ -0,0 +1,187 @@
+import json
+import sys
+import time
+import threading
+from contextlib import nullcontext
+from collections import defaultdict
+
+# Active profiler, or None. Instrumented code only checks this global, so leaving
+# profiling disabled costs one function call per stage.
+_profiler = None
+_NULL_STAGE = nullcontext()
+
+class _Stage:
+    """Context manager that adds its elapsed time to a profiler stage."""
+
+    __slots__ = ('profiler', 'name', 'start', 'record')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.record = None
+        if self.profiler.trace is not None:
+            import torch
+
+            self.record = torch.profiler.record_function(self.name)
+            self.record.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.record is not None:
+            self.record.__exit__(*exc)
+        self.profiler.add_time(self.name, elapsed)
+        return False
+
+class Profiler:
+    """
+    Per-stage timers and counters for one run of the pipeline.
+
+    Stages (decode, resize, preprocess, forward, smooth, overlay, encode, ...) add up
+    their wall time and number of calls, and counters (frames, clips, samples) count
+    the work done, so the report can derive frames/sec and clips/sec. Stages can be
+    timed from several threads at once.
+
+    Args:
+        trace_path (str): If given, also record a torch.profiler trace and export it to
+            this file (Chrome trace format) when the profiler is stopped.
+    """
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.trace = None
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+        self._start = None
+        self._end = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.trace_path is not None:
+            import torch
+
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self.trace = torch.profiler.profile(activities=activities)
+            self.trace.__enter__()
+        return self
+
+    def stop(self):
+        self._end = time.perf_counter()
+        if self.trace is not None:
+            self.trace.__exit__(None, None, None)
+            self.trace.export_chrome_trace(self.trace_path)
+            self.trace = None
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add_time(self, name, elapsed):
+        with self._lock:
+            self.times[name] += elapsed
+            self.calls[name] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def report(self):
+        """
+        Summarize the run.
+
+        Returns:
+            dict: Wall time, peak RSS (None if unknown), counters, per-stage total/mean time and share of
+                the wall time, and frames/sec, clips/sec and samples/sec over the wall time.
+        """
+        end = self._end if self._end is not None else time.perf_counter()
+        wall = end - self._start if self._start is not None else 0.0
+        stages = {
+            name: {
+                'total_sec': total,
+                'calls': self.calls[name],
+                'mean_ms': total / self.calls[name] * 1000,
+                'wall_fraction': total / wall if wall else None,
+            }
+            for name, total in sorted(self.times.items(), key=lambda item: -item[1])
+        }
+        rates = {f"{name}_per_sec": n / wall for name, n in self.counters.items() if wall}
+        return {
+            'wall_sec': wall,
+            'peak_rss_mb': peak_rss_mb(),
+            'counters': dict(self.counters),
+            'rates': rates,
+            'stages': stages,
+        }
+
+    def save(self, path):
+        """Write the report to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+        return path
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def enable(trace_path=None):
+    """Start profiling the stages instrumented with stage() and count()."""
+    global _profiler
+    _profiler = Profiler(trace_path).start()
+    return _profiler
+
+def disable():
+    """Stop profiling and return the profiler, or None if it was not enabled."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def get_profiler():
+    return _profiler
+
+def stage(name):
+    """Time a block as a stage of the active profiler (a no-op when profiling is disabled)."""
+    profiler = _profiler
+    return _NULL_STAGE if profiler is None else profiler.stage(name)
+
+def count(name, n=1):
+    """Increment a counter of the active profiler (a no-op when profiling is disabled)."""
+    profiler = _profiler
+    if profiler is not None:
+        profiler.count(name, n)
+
+def timed_iter(iterable, name):
+    """
+    Time each step of an iterator (e.g. a decoder) as a stage.
+
+    Returns the iterable unchanged when profiling is disabled.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return iterable
+
+    def generator():
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            profiler.add_time(name, time.perf_counter() - start)
+            yield item
+
+    return generator()
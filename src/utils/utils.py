@@ -1,5 +1,7 @@
-from scipy.ndimage import uniform_filter1d
-from scipy.ndimage import gaussian_filter1d
+import numpy as np
+from collections import deque
+
+from src.utils.profiling import stage
 
 def smooth_predictions(predicted_classes, probs, window_size= 5):
     """
@@ -13,10 +15,258 @@ def smooth_predictions(predicted_classes, probs, window_size= 5):
     Returns:
         Tuple[List[int], np.ndarray]: Smoothed predicted classes and probabilities.
     """
-    # Smooth predicted classes
-    smoothed_classes = uniform_filter1d(predicted_classes, size=window_size, mode='nearest').astype(int).tolist()
-    
-    # Smooth probabilities
-    smoothed_probs = gaussian_filter1d(probs, sigma=window_size, axis=0)
+    # scipy is only imported when smoothing is used
+    from scipy.ndimage import uniform_filter1d
+    from scipy.ndimage import gaussian_filter1d
+
+    with stage('smooth'):
+        # Smooth predicted classes
+        smoothed_classes = uniform_filter1d(predicted_classes, size=window_size, mode='nearest').astype(int).tolist()
+
+        # Smooth probabilities
+        smoothed_probs = gaussian_filter1d(probs, sigma=window_size, axis=0)
     
-    return smoothed_classes, smoothed_probs
\ No newline at end of file
+    return smoothed_classes, smoothed_probs
+
+class StreamingGaussianSmoother:
+    """
+    Fixed-lag version of the Gaussian smoothing applied by smooth_predictions.
+
+    Produces the same smoothed probabilities as smooth_predictions, but a clip is
+    finalized as soon as the clips within the filter radius after it are known,
+    instead of after the whole video has been classified.
+
+    Args:
+        window_size (int): Same as in smooth_predictions (used as the Gaussian sigma).
+        truncate (float): Truncation of the Gaussian kernel, in standard deviations.
+    """
+
+    def __init__(self, window_size=5, truncate=4.0):
+        self.sigma = window_size
+        self.truncate = truncate
+        self.radius = int(truncate * window_size + 0.5)
+        self._probs = None    # Recent clip probabilities still needed as context
+        self._offset = 0      # Clip index of the first row in self._probs
+        self._done = 0        # Number of clips already finalized
+
+    def _smooth(self, end, last):
+        # Clips in [self._done, end) only depend on rows within the kernel radius,
+        # so filtering this window gives the same values as filtering the whole video
+        start = max(0, self._done - self.radius)
+        from scipy.ndimage import gaussian_filter1d
+
+        window = self._probs[start - self._offset:last - self._offset]
+        smoothed = gaussian_filter1d(window, sigma=self.sigma, axis=0, truncate=self.truncate)
+        smoothed = smoothed[self._done - start:end - start]
+        self._done = end
+        drop = max(0, self._done - self.radius) - self._offset
+        self._probs = self._probs[drop:]
+        self._offset += drop
+        return smoothed
+
+    def update(self, probs):
+        """
+        Add the probabilities of new clips.
+
+        Args:
+            probs (np.ndarray): Probabilities of the new clips, shape (n, num_classes).
+
+        Returns:
+            np.ndarray: Smoothed probabilities of the clips finalized by this update.
+        """
+        self._probs = probs if self._probs is None else np.concatenate([self._probs, probs])
+        seen = self._offset + len(self._probs)
+        end = max(self._done, seen - self.radius)
+        return self._smooth(end, seen)
+
+    def finish(self):
+        """Finalize the remaining clips at the end of the video."""
+        if self._probs is None:
+            return np.empty((0, 0))
+        seen = self._offset + len(self._probs)
+        return self._smooth(seen, seen)
+
+class ExponentialSmoother:
+    """
+    Causal exponential moving average of the clip probabilities.
+
+    Every clip is finalized as soon as it is classified (no delay), at the cost of
+    a one-sided filter that lags behind label changes.
+
+    Args:
+        window_size (int): Span of the average in clips, alpha = 2 / (window_size + 1).
+    """
+
+    def __init__(self, window_size=5):
+        self.alpha = 2.0 / (window_size + 1)
+        self._state = None
+
+    def update(self, probs):
+        """
+        Add the probabilities of new clips.
+
+        Args:
+            probs (np.ndarray): Probabilities of the new clips, shape (n, num_classes).
+
+        Returns:
+            np.ndarray: Smoothed probabilities of the same clips.
+        """
+        smoothed = np.empty(probs.shape, dtype=np.float64)
+        for i, row in enumerate(probs):
+            self._state = row if self._state is None else self._state + self.alpha * (row - self._state)
+            smoothed[i] = self._state
+        return smoothed.astype(probs.dtype)
+
+    def finish(self):
+        """Nothing is pending: every clip was finalized by update."""
+        return np.empty((0, 0 if self._state is None else len(self._state)))
+
+class ViterbiSmoother:
+    """
+    Fixed-lag Viterbi decoding of the most likely label sequence.
+
+    The clip probabilities are the emission scores of an HMM in which changing the
+    label costs `switch_penalty` (in log-probability units) and staying is free.
+    Because the penalty is the same for every pair of classes, the forward step
+    costs O(classes) per clip. Each clip is decided exactly `lag` clips after it is
+    classified, by tracing back O(lag) backpointers from the best state at that
+    time, so the labels do not depend on how the clips are split across updates.
+
+    The decoded labels are returned as one-hot rows, so `argmax(axis=1)` gives
+    the label, as with the other smoothers.
+
+    Args:
+        switch_penalty (float): Cost of a label change; higher values give longer segments.
+        lag (int): Number of later clips seen before a clip is decided.
+    """
+
+    def __init__(self, switch_penalty=2.0, lag=20):
+        self.switch_penalty = switch_penalty
+        self.lag = lag
+        self._scores = None
+        self._backpointers = deque()  # One array per undecided clip: best previous label of each label
+        self._num_classes = 0
+        self._one_hot = None
+
+    def _decide(self, count, state):
+        # Trace back from `state` at the last clip and return the labels of the oldest `count` clips
+        labels = np.empty(count, dtype=np.int64)
+        for i, backpointer in zip(range(len(self._backpointers) - 1, -1, -1), reversed(self._backpointers)):
+            if i < count:
+                labels[i] = state
+            state = backpointer[state]
+        for _ in range(count):
+            self._backpointers.popleft()
+        return labels
+
+    def update(self, probs):
+        """
+        Add the probabilities of new clips.
+
+        Args:
+            probs (np.ndarray): Probabilities of the new clips, shape (n, num_classes).
+
+        Returns:
+            np.ndarray: One-hot labels of the clips decided by this update.
+        """
+        if self._one_hot is None:
+            self._num_classes = probs.shape[1]
+            self._one_hot = np.eye(self._num_classes, dtype=np.float32)
+        log_probs = np.log(np.maximum(probs, 1e-12))
+        decided = []
+        for row in log_probs:
+            if self._scores is None:
+                self._scores = row.astype(np.float64)
+                self._backpointers.append(np.arange(self._num_classes))
+            else:
+                best = int(self._scores.argmax())
+                switch = self._scores[best] - self.switch_penalty
+                stay = self._scores >= switch
+                self._backpointers.append(np.where(stay, np.arange(self._num_classes), best))
+                self._scores = np.maximum(self._scores, switch) + row
+            # The oldest clip now has `lag` clips after it: decide it from the current best state
+            if len(self._backpointers) > self.lag:
+                decided.append(self._decide(1, int(self._scores.argmax()))[0])
+        return self._one_hot[np.array(decided, dtype=np.int64)]
+
+    def finish(self):
+        """Decide the remaining clips at the end of the video."""
+        if self._scores is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._one_hot[self._decide(len(self._backpointers), int(self._scores.argmax()))]
+
+SMOOTHERS = ['gaussian', 'ema', 'viterbi']
+
+def make_smoother(name, window_size=5, switch_penalty=2.0):
+    """
+    Create a streaming smoother by name.
+
+    All smoothers share the update(probs) / finish() interface. The Gaussian and
+    Viterbi smoothers finalize a clip after the same delay, int(4 * window_size + 0.5)
+    clips; the exponential moving average has no delay.
+
+    Args:
+        name (str): 'gaussian', 'ema' or 'viterbi'.
+        window_size (int): Smoothing window in clips.
+        switch_penalty (float): Cost of a label change for the Viterbi smoother.
+
+    Returns:
+        object: StreamingGaussianSmoother, ExponentialSmoother or ViterbiSmoother.
+    """
+    if name == 'gaussian':
+        return StreamingGaussianSmoother(window_size=window_size)
+    if name == 'ema':
+        return ExponentialSmoother(window_size=window_size)
+    if name == 'viterbi':
+        return ViterbiSmoother(switch_penalty=switch_penalty, lag=int(4.0 * window_size + 0.5))
+    raise ValueError(f"Unknown smoother '{name}', expected one of {SMOOTHERS}")
+
+def smooth_stream(smoother, probs):
+    """Run a streaming smoother over all the clip probabilities at once."""
+    with stage('smooth'):
+        parts = [smoother.update(probs), smoother.finish()]
+    return np.concatenate([part for part in parts if len(part)])
+
+class SegmentTracker:
+    """
+    Turn the labels finalized by a streaming smoother into consecutive class segments.
+
+    A segment is emitted as soon as the first clip of the next segment is finalized,
+    so the delay of a segment is the smoother delay plus one clip.
+
+    Args:
+        class_names (List[str]): Class names corresponding to indices.
+    """
+
+    def __init__(self, class_names):
+        self.class_names = class_names
+        self._label = None
+        self._count = 0
+
+    def update(self, finalized):
+        """
+        Add finalized smoothed probabilities (or one-hot labels).
+
+        Args:
+            finalized (np.ndarray): Output of a smoother's update, shape (n, num_classes).
+
+        Returns:
+            List[Tuple[str, int]]: Segments completed by this update, in the format
+                of get_consecutive_classes.
+        """
+        segments = []
+        for label in (finalized.argmax(axis=1) if len(finalized) else []):
+            if label != self._label and self._count:
+                segments.append((self.class_names[self._label], self._count))
+                self._count = 0
+            self._label = label
+            self._count += 1
+        return segments
+
+    def finish(self):
+        """Return the last, still open segment."""
+        if not self._count:
+            return []
+        segment = (self.class_names[self._label], self._count)
+        self._count = 0
+        return [segment]
@@ -0,0 +1,213 @@
+import os
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+import torch
+from collections import deque
+
+from src.video.video_process import resize_frames, preprocess_clips
+from src.utils.utils import SegmentTracker
+
+def open_capture(source):
+    """
+    Open a cv2.VideoCapture from a device index, URL, pipe or file path.
+
+    Args:
+        source (Union[int, str]): Device index (an int or a string of digits), RTSP/HTTP URL,
+            GStreamer/FFmpeg pipe or local video file.
+
+    Returns:
+        cv2.VideoCapture: The opened capture.
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video source: {source}")
+    return cap
+
+class FrameGrabber(threading.Thread):
+    """
+    Read frames from a capture in a background thread.
+
+    Frames are resized to the model input size and put in a bounded queue together
+    with their capture time. When the consumer falls behind and the queue is full,
+    the oldest frame is dropped so the queue always holds the most recent frames.
+    The thread owns the capture and releases it when it stops, so a read still in
+    progress when stop() is called never races with the release.
+
+    Args:
+        cap (cv2.VideoCapture): Opened capture.
+        max_queue (int): Maximum number of frames waiting for the consumer.
+        realtime (bool): If True, pace reads at the source fps. Use it to play a local
+            file back as if it were a live camera.
+    """
+
+    def __init__(self, cap, max_queue=32, realtime=False):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.realtime = realtime
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.dropped = 0
+        self.finished = threading.Event()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            self._read_frames()
+        finally:
+            self.cap.release()
+            self.finished.set()
+
+    def _read_frames(self):
+        start = time.perf_counter()
+        index = 0
+        while not self._stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            if self.realtime:
+                delay = start + index / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            captured_at = time.perf_counter()
+
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            resized = resize_frames(torch.from_numpy(rgb).permute(2, 0, 1))
+            item = (index, captured_at, resized)
+            while True:
+                try:
+                    self.frames.put_nowait(item)
+                    break
+                except queue.Full:
+                    # Drop the oldest frame to make room for the newest one
+                    try:
+                        self.frames.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+            index += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+def run_live_recognition(source, model, device, class_names, clip_length=16, stride=16,
+                         latency_budget=None, realtime=None, max_queue=None,
+                         max_clips=None, on_prediction=None, smoother=None, on_segment=None):
+    """
+    Recognize actions on a live video source, emitting a label each time a new clip completes.
+
+    The last `clip_length` frames are kept in a ring buffer and a clip is classified
+    every `stride` new frames. If inference falls behind, frames are dropped: the
+    capture queue keeps only the newest `max_queue` frames and, with a latency budget,
+    frames older than the budget are skipped before they enter the ring buffer.
+    A KeyboardInterrupt (Ctrl-C) ends the session like the end of the source: the
+    last smoothed segments are emitted and the statistics are still returned.
+
+    Args:
+        source (Union[int, str]): Device index, RTSP URL, pipe or video file (see open_capture).
+        model (torch.nn.Module): Trained classification model.
+        device (torch.device): Device used for the forward pass.
+        class_names (List[str]): Class names corresponding to indices.
+        clip_length (int): Number of frames per clip.
+        stride (int): Number of new frames between consecutive predictions.
+        latency_budget (float): Maximum age in seconds of a frame entering a clip, or None for no limit.
+        realtime (bool): Pace a file source at its native fps. If None, enabled for local files.
+        max_queue (int): Capture queue size, defaults to `clip_length` frames.
+        max_clips (int): Stop after this many predictions, or None to run until the source ends.
+        on_prediction (Callable[[dict], None]): Called with each prediction. Prints it if None.
+        smoother (object): Streaming smoother (see src.utils.utils.make_smoother) applied to the
+            clip probabilities, or None to skip smoothing.
+        on_segment (Callable[[Tuple[str, int]], None]): Called with each smoothed segment
+            (class name, number of clips) once it is final. Prints it if None.
+
+    Returns:
+        dict: Run statistics: number of clips, frames read and dropped, and
+            end-to-end latency (mean, p95 and max, in seconds), and whether the run was
+            interrupted.
+    """
+    if realtime is None:
+        realtime = isinstance(source, str) and os.path.isfile(source)
+    if on_prediction is None:
+        on_prediction = lambda p: print(f"[frame {p['frame_index']}] {p['label']} "
+                                        f"({p['confidence']:.2f}) latency={p['latency'] * 1000:.0f} ms")
+    if on_segment is None:
+        on_segment = lambda s: print(f"[segment] {s[0]} for {s[1]} clips")
+    tracker = SegmentTracker(class_names) if smoother is not None else None
+
+    cap = open_capture(source)
+    grabber = FrameGrabber(cap, max_queue=max_queue or clip_length, realtime=realtime)
+    ring = deque(maxlen=clip_length)
+    new_frames = 0
+    frames_read = 0
+    skipped = 0
+    latencies = []
+    interrupted = False
+
+    model.eval()
+    grabber.start()
+    try:
+        while max_clips is None or len(latencies) < max_clips:
+            try:
+                index, captured_at, frame = grabber.frames.get(timeout=0.1)
+            except queue.Empty:
+                if grabber.finished.is_set() and grabber.frames.empty():
+                    break
+                continue
+            frames_read += 1
+
+            # Skip frames that are already too old to meet the latency budget
+            if latency_budget is not None and time.perf_counter() - captured_at > latency_budget:
+                skipped += 1
+                continue
+
+            ring.append(frame)
+            new_frames += 1
+            if len(ring) < clip_length or new_frames < stride:
+                continue
+            new_frames = 0
+
+            with torch.no_grad():
+                clip = preprocess_clips(torch.stack(list(ring)).unsqueeze(0).to(device))
+                probs = torch.nn.functional.softmax(model(clip), dim=1)[0].cpu()
+            latency = time.perf_counter() - captured_at
+            latencies.append(latency)
+
+            class_index = probs.argmax().item()
+            on_prediction({
+                'frame_index': index,
+                'class_index': class_index,
+                'label': class_names[class_index],
+                'confidence': probs[class_index].item(),
+                'latency': latency,
+                'dropped_frames': grabber.dropped + skipped,
+            })
+            if tracker is not None:
+                for segment in tracker.update(smoother.update(probs.unsqueeze(0).numpy())):
+                    on_segment(segment)
+    except KeyboardInterrupt:
+        # Ctrl-C is the normal way to stop a camera or stream: end the session cleanly
+        interrupted = True
+    finally:
+        # The grabber releases the capture itself once its current read returns
+        grabber.stop()
+        grabber.join(timeout=1.0)
+
+    if tracker is not None:
+        finalized = smoother.finish()
+        for segment in tracker.update(finalized) + tracker.finish():
+            on_segment(segment)
+
+    latencies = np.array(latencies)
+    return {
+        'clips': len(latencies),
+        'frames_read': frames_read + grabber.dropped,
+        'dropped_frames': grabber.dropped + skipped,
+        'latency_mean': float(latencies.mean()) if len(latencies) else None,
+        'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+        'latency_max': float(latencies.max()) if len(latencies) else None,
+        'interrupted': interrupted,
+    }
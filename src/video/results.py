@@ -0,0 +1,114 @@
+import os
+import numpy as np
+
+from src.video.video_process import save_class_lists
+from src.video.timeline import Timeline
+
+RESULTS_VERSION = 2
+
+def save_results(path, probs, class_names, fps, frames_per_class=16, clip_length=16, step=16,
+                 dtype=np.float16, timeline=None):
+    """
+    Save predictions as a compact .npz file.
+
+    The file holds the probabilities of every prediction (one row per clip, or per
+    frame), the frame and time at which each row starts, and the table of consecutive
+    segments. Arrays are stored uncompressed, so np.load reads each one directly
+    without parsing.
+
+    Args:
+        path (str): Output .npz path.
+        probs (np.ndarray): Probabilities, shape (num_predictions, num_classes).
+        class_names (List[str]): Class names corresponding to indices.
+        fps (float): Frame rate of the video.
+        frames_per_class (int): Number of video frames between consecutive predictions.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+        dtype (np.dtype): Storage type of the probabilities (float16 or float32).
+        timeline (Timeline): Frame timestamps of the video. If given, row and segment times
+            come from the decoder pts and segments are cut at the last frame.
+
+    Returns:
+        str: Path of the .npz file.
+    """
+    labels = probs.argmax(axis=1)
+    if timeline is None:
+        timeline = Timeline.from_fps(len(probs) * frames_per_class, fps)
+    frame_start, _ = timeline.prediction_frames(len(probs), frames_per_class)
+
+    # Segments: first prediction of each run of equal labels
+    change = np.flatnonzero(np.diff(labels)) + 1
+    segment_first = np.concatenate([[0], change]).astype(np.int64) if len(labels) else np.empty(0, np.int64)
+    segment_count = np.diff(np.append(segment_first, len(labels)))
+
+    np.savez(
+        path,
+        version=np.int32(RESULTS_VERSION),
+        probs=probs.astype(dtype),
+        frame_start=frame_start,
+        time_start=timeline.time_of(frame_start).astype(np.float32),
+        segment_class=labels[segment_first].astype(np.int16),
+        segment_start_frame=segment_first * frames_per_class,
+        segment_num_predictions=segment_count.astype(np.int64),
+        num_frames=np.int64(timeline.num_frames),
+        frame_times=timeline.times,
+        end_time=np.float64(timeline.end_time),
+        class_names=np.array(class_names),
+        fps=np.float64(fps),
+        frames_per_class=np.int64(frames_per_class),
+        clip_length=np.int64(clip_length),
+        step=np.int64(step),
+    )
+    return path
+
+def load_results(path):
+    """
+    Load a .npz file written by save_results.
+
+    Args:
+        path (str): Path of the .npz file.
+
+    Returns:
+        dict: Arrays of the file; scalars (fps, frames_per_class, ...) as Python numbers
+            and class_names as a list of str.
+    """
+    with np.load(path) as data:
+        results = {key: data[key] for key in data.files}
+    # Version 1 files have no frame timestamps
+    for key in ('version', 'frames_per_class', 'clip_length', 'step', 'num_frames'):
+        if key in results:
+            results[key] = int(results[key])
+    for key in ('fps', 'end_time'):
+        if key in results:
+            results[key] = float(results[key])
+    results['class_names'] = results['class_names'].tolist()
+    return results
+
+def results_to_class_list(results):
+    """Rebuild the consecutive class list of get_consecutive_classes from loaded results."""
+    names = results['class_names']
+    return [(names[label], int(count))
+            for label, count in zip(results['segment_class'], results['segment_num_predictions'])]
+
+def results_to_json(path, save_path=None, file_name=None):
+    """
+    Convert a .npz results file into the *_actions_frames.json and *_actions_seconds.json files.
+
+    Args:
+        path (str): Path of the .npz file.
+        save_path (str): Output directory, defaults to the directory of the .npz file.
+        file_name (str): Base name of the JSON files, defaults to the .npz file name.
+
+    Returns:
+        str: Path of the JSON file with the durations in seconds.
+    """
+    results = load_results(path)
+    if save_path is None:
+        save_path = os.path.dirname(path) or "."
+    if file_name is None:
+        file_name = os.path.splitext(os.path.basename(path))[0]
+    timeline = None
+    if 'frame_times' in results:
+        timeline = Timeline(results['frame_times'], results['fps'], results['end_time'])
+    return save_class_lists(results_to_class_list(results), results['fps'], save_path, file_name,
+                            frames_per_class=results['frames_per_class'], timeline=timeline)
@@ -0,0 +1,304 @@
+import io
+import json
+import time
+import queue
+import threading
+import torch
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.video.video_process import (
+    iter_video_frames, resize_frames, iter_clips, preprocess_clips, get_consecutive_classes,
+)
+
+class ServerBusy(Exception):
+    """Raised when the request queue is full and a new request cannot be accepted."""
+
+class VideoDecodeError(ValueError):
+    """Raised when the video of a request cannot be opened or decoded, or has no frames."""
+
+class ClipBatcher(threading.Thread):
+    """
+    Run the model on clips collected from concurrent requests.
+
+    Requests put blocks of resized clips in a bounded queue. The batcher thread takes
+    the first waiting block, then keeps collecting blocks until the batch holds
+    `max_batch_size` clips or `max_wait` seconds have passed since the first one,
+    and runs a single forward pass for all of them.
+
+    Args:
+        model (torch.nn.Module): Trained classification model.
+        device (torch.device): Device used for the forward pass.
+        max_batch_size (int): Maximum number of clips per forward pass.
+        max_wait (float): Seconds a block may wait for other requests to fill the batch.
+        max_queue (int): Maximum number of blocks waiting for the batcher.
+    """
+
+    def __init__(self, model, device, max_batch_size=16, max_wait=0.01, max_queue=64):
+        super().__init__(daemon=True)
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue(maxsize=max_queue)
+        self.batches = 0
+        self.clips = 0
+        self._carry = None
+        self._stop_event = threading.Event()
+
+    def submit(self, clips, block=False, timeout=None):
+        """
+        Queue a block of clips for classification.
+
+        Args:
+            clips (torch.Tensor): uint8 clips of shape (N, T, C, H, W) from resize_frames,
+                with N at most max_batch_size.
+            block (bool): Wait for room in the queue instead of failing when it is full.
+            timeout (float): Maximum seconds to wait when block is True.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the clip probabilities, shape (N, num_classes).
+
+        Raises:
+            ServerBusy: If the queue is full.
+        """
+        future = Future()
+        try:
+            self.requests.put((clips, future), block=block, timeout=timeout)
+        except queue.Full:
+            raise ServerBusy("Request queue is full") from None
+        return future
+
+    def is_full(self):
+        """Whether a new block would be rejected by submit() right now."""
+        return self.requests.full()
+
+    def warm_up(self, clip_length=16, batch_sizes=None):
+        """Run the model once per batch size so the first requests do not pay for lazy initialization."""
+        sizes = batch_sizes or sorted({1, self.max_batch_size})
+        clip = torch.zeros((clip_length, 3, 112, 112), dtype=torch.uint8)
+        with torch.no_grad():
+            for size in sizes:
+                self.model(preprocess_clips(clip.expand(size, *clip.shape).to(self.device)))
+
+    def _next_block(self, timeout):
+        if self._carry is not None:
+            block, self._carry = self._carry, None
+            return block
+        return self.requests.get(timeout=timeout)
+
+    def run(self):
+        self.model.eval()
+        while not self._stop_event.is_set():
+            try:
+                batch = [self._next_block(timeout=0.1)]
+            except queue.Empty:
+                continue
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    block = self._next_block(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(block[0]) > self.max_batch_size:
+                    # Keep it for the next batch so no forward pass exceeds max_batch_size
+                    self._carry = block
+                    break
+                batch.append(block)
+                size += len(block[0])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            with torch.no_grad():
+                clips = torch.cat([clips for clips, _ in batch]).to(self.device)
+                probs = torch.nn.functional.softmax(self.model(preprocess_clips(clips)), dim=1).cpu()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.clips += len(probs)
+        for block_probs, (_, future) in zip(probs.split([len(clips) for clips, _ in batch]), batch):
+            future.set_result(block_probs)
+
+    def stop(self):
+        self._stop_event.set()
+
+def classify_with_batcher(video, batcher, clip_length=16, step=16, timeout=60.0):
+    """
+    Classify a video through a ClipBatcher.
+
+    Clips are submitted in blocks of at most `max_batch_size` as they are decoded, so
+    decoding overlaps with inference and memory does not grow with the video length.
+    A saturated server is detected before anything is decoded, and the first block
+    still fails fast if the queue filled up meanwhile; later blocks of an accepted
+    request wait for room in the queue.
+
+    Args:
+        video (Union[str, io.BytesIO]): Video path or in-memory video file.
+        batcher (ClipBatcher): Running batcher.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+        timeout (float): Maximum seconds to wait for queue room and for each block result.
+
+    Returns:
+        torch.Tensor: Clip probabilities, shape (num_clips, num_classes).
+
+    Raises:
+        ServerBusy: If the queue is full when the request starts.
+        VideoDecodeError: If the video cannot be decoded or has no frames.
+    """
+    if batcher.is_full():
+        raise ServerBusy("Request queue is full")
+
+    def decoded_frames():
+        try:
+            for frame in iter_video_frames(video):
+                yield resize_frames(frame)
+        except Exception as e:
+            raise VideoDecodeError(f"Could not decode the video: {e}") from e
+
+    futures = []
+    block = []
+    for clip in iter_clips(decoded_frames(), clip_length, step):
+        block.append(clip)
+        if len(block) == batcher.max_batch_size:
+            futures.append(batcher.submit(torch.stack(block), block=bool(futures), timeout=timeout))
+            block = []
+    if block:
+        futures.append(batcher.submit(torch.stack(block), block=bool(futures), timeout=timeout))
+    if not futures:
+        raise VideoDecodeError("The video has no frames")
+    return torch.cat([future.result(timeout=timeout) for future in futures])
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints of the inference server.
+
+    GET /health returns the server state. POST /classify takes either a video file
+    as the request body (any non-JSON content type) or a JSON object
+    {"video_path": ..., "step": ...} when the server allows local paths, and returns
+    the clip probabilities, the predicted classes and the consecutive class segments.
+    Bodies larger than the server's max_body_bytes get 413, videos that cannot be
+    decoded get 400 and, when the queue is full, 503 is returned before decoding.
+    """
+
+    server_version = "ActionRecognition/1.0"
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        batcher = self.server.batcher
+        self._send_json(200, {
+            'status': 'ok',
+            'queued_blocks': batcher.requests.qsize(),
+            'batches': batcher.batches,
+            'clips': batcher.clips,
+            'mean_batch_size': batcher.clips / batcher.batches if batcher.batches else None,
+        })
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError("negative Content-Length")
+            if length > self.server.max_body_bytes:
+                # The body is not read, so the connection cannot be reused
+                self.close_connection = True
+                self._send_json(413, {'error': f"Request body of {length} bytes exceeds the limit of "
+                                               f"{self.server.max_body_bytes} bytes"})
+                return
+            body = self.rfile.read(length)
+            step = self.server.clip_length
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("the JSON body must be an object")
+                if not self.server.allow_paths:
+                    self._send_json(403, {'error': "Local video paths are disabled, upload the video instead"})
+                    return
+                video = request['video_path']
+                if not isinstance(video, str):
+                    raise ValueError("video_path must be a string")
+                step = int(request.get('step', step))
+            else:
+                video = io.BytesIO(body)
+            if not 1 <= step <= self.server.clip_length:
+                raise ValueError(f"step must be between 1 and {self.server.clip_length}")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f"Invalid request: {e!r}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            probs = classify_with_batcher(video, self.server.batcher, self.server.clip_length, step,
+                                          timeout=self.server.request_timeout)
+        except ServerBusy as e:
+            self._send_json(503, {'error': str(e)}, headers={'Retry-After': '1'})
+            return
+        except VideoDecodeError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': repr(e)})
+            return
+
+        predicted_classes = probs.argmax(dim=1).tolist()
+        self._send_json(200, {
+            'clip_length': self.server.clip_length,
+            'step': step,
+            'probs': probs.tolist(),
+            'predicted_classes': predicted_classes,
+            'segments': get_consecutive_classes(predicted_classes, self.server.class_names),
+            'elapsed_sec': time.perf_counter() - start,
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(batcher, class_names, host='127.0.0.1', port=8000, clip_length=16,
+                allow_paths=False, request_timeout=60.0, max_body_bytes=512 * 2**20):
+    """
+    Create the HTTP server around a running ClipBatcher.
+
+    Each request is handled in its own thread, which decodes the video and waits for
+    the batcher, so concurrent requests share forward passes.
+
+    Args:
+        batcher (ClipBatcher): Started batcher holding the model.
+        class_names (List[str]): Class names corresponding to indices.
+        host (str): Address to listen on.
+        port (int): Port to listen on (0 picks a free port).
+        clip_length (int): Number of frames per clip.
+        allow_paths (bool): Accept paths of videos on the server's file system.
+        request_timeout (float): Maximum seconds a request waits for the batcher.
+        max_body_bytes (int): Largest accepted upload; larger requests get 413.
+
+    Returns:
+        http.server.ThreadingHTTPServer: Server ready for serve_forever().
+    """
+    server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.batcher = batcher
+    server.class_names = class_names
+    server.clip_length = clip_length
+    server.allow_paths = allow_paths
+    server.request_timeout = request_timeout
+    server.max_body_bytes = max_body_bytes
+    return server
@@ -0,0 +1,133 @@
+import numpy as np
+
+class Timeline:
+    """
+    Presentation timestamps of the frames of a video.
+
+    Maps prediction indices and consecutive class lists to exact frame ranges and
+    times. Ranges are clipped to the frames the video really has, so the zero-padded
+    tail clip only covers the frames left at the end, and times come from the
+    decoder's pts, so variable frame rate videos line up too. Times are relative to
+    the first frame.
+
+    Args:
+        timestamps (Sequence[float]): Presentation time of each frame in seconds, in
+            display order. Missing values (None) are filled in from the frame rate.
+        fps (float): Nominal frame rate, used for missing timestamps and the last frame duration.
+        end_time (float): Time at which the last frame ends, defaults to its pts plus 1 / fps.
+    """
+
+    def __init__(self, timestamps, fps, end_time=None):
+        times = np.array([np.nan if t is None else t for t in timestamps], dtype=np.float64)
+        missing = np.isnan(times)
+        if missing.any():
+            times[missing] = np.flatnonzero(missing) / fps
+        start = times[0] if len(times) else 0.0
+        self.fps = fps
+        self.times = times - start
+        if end_time is None:
+            end_time = times[-1] + 1.0 / fps if len(times) else start
+        self.end_time = end_time - start
+        # Start time of every frame plus the end of the video, so frame ranges [a, b) map to bounds[a], bounds[b]
+        self._bounds = np.append(self.times, self.end_time)
+
+    @classmethod
+    def from_fps(cls, num_frames, fps):
+        """Timeline of a constant frame rate video."""
+        return cls(np.arange(num_frames) / fps, fps)
+
+    @classmethod
+    def from_video(cls, video_path):
+        """
+        Read the frame timestamps of a video from its packets, without decoding.
+
+        Falls back to decoding when the container does not store a pts for every packet.
+
+        Args:
+            video_path (str): Path to the input video.
+
+        Returns:
+            Timeline: Timeline of the video.
+        """
+        import av
+
+        container = av.open(video_path)
+        try:
+            stream = container.streams.video[0]
+            fps = float(stream.average_rate or stream.guessed_rate or 30)
+            packets = [(packet.pts, packet.duration) for packet in container.demux(stream) if packet.size]
+            if packets and all(pts is not None for pts, _ in packets):
+                time_base = float(stream.time_base)
+                packets.sort()
+                pts, duration = packets[-1]
+                end_time = (pts + duration) * time_base if duration else None
+                return cls([pts * time_base for pts, _ in packets], fps, end_time)
+
+            container.seek(0)
+            return cls([frame.time for frame in container.decode(stream)], fps)
+        finally:
+            container.close()
+
+    @property
+    def num_frames(self):
+        return len(self.times)
+
+    @property
+    def duration(self):
+        return self.end_time
+
+    def time_of(self, frame_index):
+        """Start time of a frame (or array of frames); the index num_frames gives the end of the video."""
+        return self._bounds[np.clip(frame_index, 0, self.num_frames)]
+
+    def prediction_frames(self, num_predictions, frames_per_prediction):
+        """
+        Frame range shown for each prediction.
+
+        Args:
+            num_predictions (int): Number of predictions.
+            frames_per_prediction (int): Frames between consecutive predictions (the clip step,
+                or 1 for per-frame predictions).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and end (exclusive) frame of each prediction.
+        """
+        starts = np.arange(num_predictions, dtype=np.int64) * frames_per_prediction
+        return np.minimum(starts, self.num_frames), np.minimum(starts + frames_per_prediction, self.num_frames)
+
+    def segment_frames(self, class_list, frames_per_class=16):
+        """
+        Frame range of each segment of a consecutive class list.
+
+        Args:
+            class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+            frames_per_class (int): Number of video frames covered by one counted prediction.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and end (exclusive) frame of each segment.
+        """
+        ends = np.cumsum([count * frames_per_class for _, count in class_list], dtype=np.int64)
+        ends = np.minimum(ends, self.num_frames)
+        starts = np.concatenate([[0], ends[:-1]]).astype(np.int64)
+        return starts, ends
+
+    def segment_times(self, class_list, frames_per_class=16):
+        """Start and end time in seconds of each segment of a consecutive class list."""
+        starts, ends = self.segment_frames(class_list, frames_per_class)
+        return self.time_of(starts), self.time_of(ends)
+
+    def frame_labels(self, class_list, frames_per_class=16):
+        """
+        Segment index of every frame, for O(1) label lookup while writing the video.
+
+        Args:
+            class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+            frames_per_class (int): Number of video frames covered by one counted prediction.
+
+        Returns:
+            np.ndarray: Index into class_list for each frame, or -1 for frames past the last segment.
+        """
+        starts, ends = self.segment_frames(class_list, frames_per_class)
+        labels = np.full(self.num_frames, -1, dtype=np.int64)
+        labels[:ends[-1] if len(ends) else 0] = np.repeat(np.arange(len(class_list)), ends - starts)
+        return labels
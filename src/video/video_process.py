@@ -1,52 +1,342 @@
 import os
-import cv2
 import json
+import queue
+import threading
 import torch
-import torchvision.io as io
-from torchvision.models.video import R3D_18_Weights
+import numpy as np
+from collections import deque
 from itertools import groupby
 
-def classify_video(video_path, model, device, single_class=True,clip_length=16, step=16):
-    # Load the video (output: (T, H, W, C))
-    video, _, _ = io.read_video(video_path, pts_unit='sec')
-    video = video.permute(0, 3, 1, 2)  
+from src.video.timeline import Timeline
+from src.utils.profiling import stage, count, timed_iter
 
-    # Split into clips of 16 frames
+# av, cv2 and torchvision are imported inside the functions that use them, so importing
+# this module (e.g. to only smooth or export cached results) stays fast
+
+# Preprocessing parameters of the R3D_18 model, same as R3D_18_Weights.DEFAULT.transforms()
+RESIZE_SIZE = [128, 171]
+CROP_SIZE = [112, 112]
+MEAN = [0.43216, 0.394666, 0.37645]
+STD = [0.22803, 0.22145, 0.216989]
+
+def iter_video_frames(video_path, timestamps=None):
+    """
+    Decode a video one frame at a time.
+
+    Frames are decoded with PyAV, the backend behind torchvision.io.read_video,
+    so the stream holds the same frames read_video would return at once.
+
+    Args:
+        video_path (Union[str, io.BytesIO]): Path to the input video, or an in-memory video file.
+        timestamps (List[float]): If given, the presentation time (decoder pts, in seconds)
+            of each frame is appended to it, e.g. to build a Timeline.
+
+    Yields:
+        torch.Tensor: RGB frame of shape (C, H, W) and dtype uint8.
+    """
+    import av
+
+    container = av.open(video_path)
+    try:
+        for frame in timed_iter(container.decode(video=0), 'decode'):
+            if timestamps is not None:
+                timestamps.append(frame.time)
+            count('frames')
+            with stage('convert'):
+                rgb = torch.from_numpy(frame.to_ndarray(format='rgb24')).permute(2, 0, 1)
+            yield rgb
+    finally:
+        container.close()
+
+def resize_frames(frames):
+    """
+    Downscale and center crop uint8 frames to the model input size.
+
+    This is the spatial part of the R3D_18 transforms (resize to 128x171 without
+    antialiasing, then center crop to 112x112). It works frame by frame, so it can
+    run right after decoding and clips never hold full-resolution frames.
+
+    Args:
+        frames (torch.Tensor): uint8 frames of shape (..., C, H, W).
+
+    Returns:
+        torch.Tensor: uint8 frames of shape (..., C, 112, 112).
+    """
+    import torchvision.transforms.functional as F
+
+    with stage('resize'):
+        frames = F.resize(frames, RESIZE_SIZE,
+                          interpolation=F.InterpolationMode.BILINEAR, antialias=False)
+        return F.center_crop(frames, CROP_SIZE)
+
+def preprocess_clips(clips):
+    """
+    Convert a block of resized clips into normalized model input in one pass.
+
+    Together with resize_frames this gives the same values as applying the
+    R3D_18 transforms to each clip separately.
+
+    Args:
+        clips (torch.Tensor): uint8 clips of shape (N, T, C, H, W) from resize_frames.
+
+    Returns:
+        torch.Tensor: float clips of shape (N, C, T, H, W).
+    """
+    mean = torch.tensor(MEAN, device=clips.device).view(1, 1, -1, 1, 1)
+    std = torch.tensor(STD, device=clips.device).view(1, 1, -1, 1, 1)
+    clips = clips.float().div_(255)
+    clips.sub_(mean).div_(std)
+    return clips.permute(0, 2, 1, 3, 4).contiguous()
+
+def iter_clips(frames, clip_length=16, step=16):
+    """
+    Group a stream of frames into clips as the frames arrive.
+
+    Clips start every `step` frames. Clips that run past the end of the stream
+    are zero-padded to `clip_length`, exactly like the whole-video split in
+    classify_video. Only the frames of the clip being built are kept in memory.
+
+    Args:
+        frames (Iterable[torch.Tensor]): Frames of shape (C, H, W).
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+
+    Yields:
+        torch.Tensor: Clip of shape (clip_length, C, H, W).
+    """
+    buffer = deque()
+    next_start = 0
+    for index, frame in enumerate(frames):
+        if index < next_start:
+            continue
+        buffer.append(frame)
+        if len(buffer) == clip_length:
+            yield torch.stack(list(buffer))
+            next_start += step
+            for _ in range(min(step, len(buffer))):
+                buffer.popleft()
+
+    # Pad the clips that start before the end of the stream
+    while buffer:
+        pad = torch.zeros((clip_length - len(buffer), *buffer[0].shape), dtype=buffer[0].dtype)
+        yield torch.cat([torch.stack(list(buffer)), pad], dim=0)
+        for _ in range(min(step, len(buffer))):
+            buffer.popleft()
+
+def get_video_info(video_path):
+    """
+    Read the frame rate and frame size of a video without decoding it.
+
+    Args:
+        video_path (str): Path to the input video.
+
+    Returns:
+        Tuple[float, int, int]: fps, width and height.
+    """
+    import av
+
+    container = av.open(video_path)
+    try:
+        stream = container.streams.video[0]
+        fps = float(stream.average_rate or stream.guessed_rate)
+        return fps, stream.width, stream.height
+    finally:
+        container.close()
+
+# Approximate peak memory of one R3D_18 clip (3x16x112x112) in a no_grad forward pass,
+# measured on CPU with float32 activations
+CLIP_MEMORY_BYTES = 80 * 1024 ** 2
+
+def _available_memory(device):
+    """Return the free memory in bytes on the given device, or None if it cannot be read."""
+    if device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(device)
+        return free
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def auto_batch_size(device, memory_fraction=0.5, max_batch_size=64, default=8):
+    """
+    Pick the number of clips per forward pass from the memory available on the device.
+
+    Args:
+        device (torch.device): Device used for the forward pass.
+        memory_fraction (float): Fraction of the available memory the batch may use.
+        max_batch_size (int): Upper bound for the batch size.
+        default (int): Batch size used when the available memory cannot be read.
+
+    Returns:
+        int: Batch size between 1 and max_batch_size.
+    """
+    available = _available_memory(torch.device(device))
+    if available is None:
+        return default
+    return int(max(1, min(max_batch_size, available * memory_fraction // CLIP_MEMORY_BYTES)))
+
+def _predict_batch(batch, model, device):
+    """Preprocess a list of resized clips and return their softmax output on the CPU."""
+    with stage('preprocess'):
+        inputs = preprocess_clips(torch.stack(batch).to(device))
+    with stage('forward'):
+        probs = torch.nn.functional.softmax(model(inputs), dim=1).cpu()
+    count('clips', len(batch))
+    return probs
+
+def _iter_clip_probs(clips, model, device, batch_size):
+    """Yield the softmax output of each mini-batch of at most `batch_size` resized clips."""
+    batch = []
+    with torch.no_grad():
+        for clip in clips:
+            batch.append(clip)
+            if len(batch) == batch_size:
+                yield _predict_batch(batch, model, device)
+                batch = []
+        if batch:
+            yield _predict_batch(batch, model, device)
+
+def _classify_clip_stream(clips, model, device, batch_size):
+    """Preprocess resized clips and run the model on mini-batches of at most `batch_size` clips."""
+    return torch.cat(list(_iter_clip_probs(clips, model, device, batch_size)))
+
+def sample_clips(video_path, num_clips=16, clip_length=16, step=16):
+    """
+    Preprocess the first clips of a video, e.g. to calibrate a quantized model.
+
+    Args:
+        video_path (str): Path to the input video.
+        num_clips (int): Maximum number of clips.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+
+    Returns:
+        torch.Tensor: Model input of shape (N, C, T, H, W).
+    """
+    frames = (resize_frames(frame) for frame in iter_video_frames(video_path))
     clips = []
-    for start in range(0, video.size(0), step):
-        end = start + clip_length
-        if end > video.size(0):
-            # Pad with zeros if needed
-            pad = torch.zeros((end - video.size(0), *video.shape[1:]), dtype=video.dtype)
-            clip = torch.cat([video[start:], pad], dim=0)
-        else:
-            clip = video[start:end]
+    for clip in iter_clips(frames, clip_length, step):
         clips.append(clip)
+        if len(clips) == num_clips:
+            break
+    return preprocess_clips(torch.stack(clips))
+
+def aggregate_clip_probs(probs, num_frames, clip_length=16, step=16):
+    """
+    Spread clip probabilities back onto the frames each clip covers.
 
-    # Apply preprocessing transforms
-    weights = R3D_18_Weights.DEFAULT
-    preprocess = weights.transforms()
-    processed_clips = []
-    for clip in clips:
-        processed_clip = preprocess(clip)
-        processed_clips.append(processed_clip)
+    Every frame gets the average probabilities of all clips that contain it,
+    which gives frame-accurate predictions when clips overlap (step < clip_length).
+    Runs in O(clips + frames) using a difference array.
 
-    processed_clips = torch.stack(processed_clips)
+    Args:
+        probs (np.ndarray): Clip probabilities, shape (num_clips, num_classes).
+        num_frames (int): Number of frames in the video.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
 
-    # Predict with model
+    Returns:
+        np.ndarray: Frame probabilities, shape (num_frames, num_classes).
+    """
+    if step > clip_length:
+        raise ValueError("step must not be larger than clip_length, otherwise some frames are not covered")
+
+    starts = np.arange(len(probs)) * step
+    ends = np.minimum(starts + clip_length, num_frames)
+
+    # Add each clip at its first frame and remove it after its last one
+    totals = np.zeros((num_frames + 1, probs.shape[1]), dtype=np.float64)
+    np.add.at(totals, starts, probs)
+    np.add.at(totals, ends, -probs)
+    counts = np.zeros(num_frames + 1, dtype=np.int64)
+    np.add.at(counts, starts, 1)
+    np.add.at(counts, ends, -1)
+
+    totals = np.cumsum(totals, axis=0)[:num_frames]
+    counts = np.cumsum(counts)[:num_frames]
+    return (totals / counts[:, None]).astype(probs.dtype)
+
+def classify_video(video_path, model, device, single_class=True,clip_length=16, step=16,
+                   stream=False, batch_size=None, per_frame=False, return_timeline=False):
+    """
+    Classify a video clip by clip with the R3D_18 model.
+
+    Args:
+        video_path (str): Path to the input video.
+        model (torch.nn.Module): Trained classification model.
+        device (torch.device): Device used for the forward pass.
+        single_class (bool): If True, average the clip probabilities into a single prediction.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+        stream (bool): If True, decode frames incrementally instead of loading the
+            whole video, so peak memory depends on `batch_size` instead of the video length.
+        batch_size (int): Number of clips per forward pass. If None, it is picked from
+            the memory available on the device (see auto_batch_size).
+        per_frame (bool): If True (and single_class is False), return one prediction per
+            frame by averaging the clips covering it (see aggregate_clip_probs). Use with
+            step < clip_length for overlapping windows; each frame is still decoded and
+            resized only once.
+        return_timeline (bool): If True, also return the Timeline of the video, built from
+            the pts of the decoded frames when streaming.
+
+    Returns:
+        Tuple: (predicted_class, avg_probs) if single_class, else
+            (predicted_classes, probs) with one row per clip, or per frame if per_frame.
+            The Timeline is appended if return_timeline.
+    """
+    if batch_size is None:
+        batch_size = auto_batch_size(device)
+
+    timestamps = []
+    if stream:
+        frames = (resize_frames(frame) for frame in iter_video_frames(video_path, timestamps))
+        clips = iter_clips(frames, clip_length, step)
+    else:
+        import torchvision.io as io
+
+        # Load the video (output: (T, H, W, C)) and downscale it to the model input size
+        video, _, _ = io.read_video(video_path, pts_unit='sec')
+        video = resize_frames(video.permute(0, 3, 1, 2))
+
+        # Split into clips of 16 frames (zero padding is unchanged by the resize)
+        clips = []
+        for start in range(0, video.size(0), step):
+            end = start + clip_length
+            if end > video.size(0):
+                # Pad with zeros if needed
+                pad = torch.zeros((end - video.size(0), *video.shape[1:]), dtype=video.dtype)
+                clip = torch.cat([video[start:], pad], dim=0)
+            else:
+                clip = video[start:end]
+            clips.append(clip)
+
+    # Preprocess and predict in mini-batches
     model.eval()
-    with torch.no_grad():
-        outputs = model(processed_clips.to(device))
-        probs = torch.nn.functional.softmax(outputs, dim=1)
-        if single_class:
-            # Average probabilities across all clips
-            avg_probs = probs.mean(dim=0)
-            predicted_class = avg_probs.argmax().item()
-            return predicted_class, avg_probs
-        else:
-            predicted_classes = probs.argmax(dim=1).cpu().numpy()
+    probs = _classify_clip_stream(clips, model, device, batch_size)
+    if stream:
+        timeline = Timeline(timestamps, get_video_info(video_path)[0])
+    elif per_frame or return_timeline:
+        timeline = Timeline.from_video(video_path)
+    if single_class:
+        # Average probabilities across all clips
+        avg_probs = probs.mean(dim=0)
+        predicted_class = avg_probs.argmax().item()
+        result = predicted_class, avg_probs
+    else:
+        probs = probs.numpy()
+        if per_frame:
+            probs = aggregate_clip_probs(probs, timeline.num_frames, clip_length, step)
+        predicted_classes = probs.argmax(axis=1)
 
-            return predicted_classes, probs.cpu().numpy()
+        result = predicted_classes, probs
+    return (*result, timeline) if return_timeline else result
 
 def get_consecutive_classes(predicted_classes, class_names):
     """
@@ -69,14 +359,281 @@ def get_consecutive_classes(predicted_classes, class_names):
 
 
 
-def annotate_video_with_classes(input_video_path, class_list, save_path, file_name):
+def save_class_lists(class_list, fps, save_path, file_name, frames_per_class=16, timeline=None):
+    """
+    Save the consecutive class list in frames and in seconds to JSON.
+
+    Args:
+        class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+        fps (float): Frame rate of the video.
+        save_path (str): Output directory.
+        file_name (str): Base name for the JSON files.
+        frames_per_class (int): Number of video frames covered by one counted prediction.
+        timeline (Timeline): Frame timestamps of the video. If given, durations are measured
+            on the frames each segment really covers (the padded tail clip ends with the
+            video) using their pts, instead of assuming frames_per_class / fps per prediction.
+
+    Returns:
+        str: Path of the JSON file with the durations in seconds.
+    """
     # Save actions list to JSON
     config_path = os.path.join(save_path, f"{file_name}_actions_frames.json")
     with open(config_path, 'w') as f:
         json.dump(class_list, f)
 
-   
+    # Convert class_list frame count into seconds via fps into a new list
+    class_seconds_list = [None] * len(class_list)
+    if timeline is not None:
+        starts, ends = timeline.segment_times(class_list, frames_per_class)
+    for i in range(len(class_list)):
+        class_name, frame_count = class_list[i]
+        if timeline is not None:
+            class_seconds_list[i] = (class_name, round(float(ends[i] - starts[i]), 2))
+        else:
+            class_seconds_list[i] = (class_name, round(((frame_count*frames_per_class) / fps), 2))
+    
+    # write the class_seconds_list to a JSON file
+    config_path = os.path.join(save_path, f"{file_name}_actions_seconds.json")
+    with open(config_path, 'w') as f:
+        json.dump(class_seconds_list, f)
+
+    return config_path
+
+def _format_srt_time(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+def save_subtitles(class_list, fps, save_path, file_name, frames_per_class=16, timeline=None):
+    """
+    Save the consecutive class list as an SRT subtitle sidecar.
+
+    The labels are shown by any player that loads the subtitle file (or can be muxed
+    into the original video with a stream copy), so the video is never re-encoded.
+
+    Args:
+        class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+        fps (float): Frame rate of the video.
+        save_path (str): Output directory.
+        file_name (str): Base name for the subtitle file.
+        frames_per_class (int): Number of video frames covered by one counted prediction.
+        timeline (Timeline): Frame timestamps of the video. If None, a constant frame rate is assumed.
+
+    Returns:
+        str: Path of the SRT file.
+    """
+    if timeline is not None:
+        starts, ends = timeline.segment_times(class_list, frames_per_class)
+    else:
+        ends = segment_boundaries(class_list, frames_per_class) / fps
+        starts = np.concatenate([[0], ends[:-1]])
+    subtitle_path = os.path.join(save_path, f"{file_name}.srt")
+    with open(subtitle_path, 'w') as f:
+        for i, ((class_name, _), start, end) in enumerate(zip(class_list, starts, ends), start=1):
+            f.write(f"{i}\n{_format_srt_time(start)} --> {_format_srt_time(end)}\n{class_name}\n\n")
+    return subtitle_path
+
+def _draw_label(frame, text):
+    """Draw the class name overlay on a BGR frame in place."""
+    import cv2
+
+    cv2.putText(frame, text, (50, 100),  # Top-left coordinates (x, y)
+                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 3)  # Green text
+
+def classify_and_annotate_video(video_path, model, device, class_names, save_path, outputs,
+                                clip_length=16, step=16, batch_size=None, render='burn', write_json=True,
+                                max_buffer_mb=1024, return_details=False):
+    """
+    Classify a video and write any number of annotated videos in a single decoding pass.
+
+    Each decoded frame is fed to the classifier and kept, at full resolution, in a
+    queue until every output knows its label, then it is drawn and written to all
+    outputs. A label is known about (batch_size + smoother lookahead) * step frames
+    after the frame is decoded, which at high resolution can take gigabytes, so the
+    queue is capped at max_buffer_mb. An automatic batch size is reduced so the queue
+    fits in the cap. Past the cap the queue is dropped and the frames not yet written
+    are decoded again once classification ends (the two-pass cost, but only for the
+    rest of the video).
+
+    Args:
+        video_path (str): Path to the input video.
+        model (torch.nn.Module): Trained classification model.
+        device (torch.device): Device used for the forward pass.
+        class_names (List[str]): Class names corresponding to indices.
+        save_path (str): Output directory.
+        outputs (Dict[str, object]): Maps each output file name to the streaming
+            smoother applied to the clip probabilities (e.g.
+            src.utils.utils.StreamingGaussianSmoother), or None for the raw predictions.
+        clip_length (int): Number of frames per clip.
+        step (int): Number of frames between the starts of consecutive clips.
+        batch_size (int): Number of clips per forward pass, or None to pick it
+            from the available memory and max_buffer_mb.
+        render (str): 'burn' to write videos with the labels drawn on the frames,
+            'subtitles' to write SRT sidecars instead, or 'none' for the JSON files only.
+        write_json (bool): Write the *_actions_frames.json and *_actions_seconds.json files.
+        max_buffer_mb (float): Memory allowed for the queue of decoded frames when render='burn'.
+        return_details (bool): Also return the probabilities each output was labeled from
+            (smoothed or raw) and the Timeline of the video.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Dict[str, Tuple[str, str]]]: Raw predicted classes,
+            raw probabilities and, for each output, the annotated video (or subtitle file,
+            or None) and JSON (or None) paths. With return_details, followed by a dict of
+            the probabilities of each output and the Timeline.
+    """
+    import cv2
+
+    os.makedirs(save_path, exist_ok=True)
+    fps, width, height = get_video_info(video_path)
+    burn = render == 'burn'
+    frame_bytes = width * height * 3
+    max_pending = max(1, int(max_buffer_mb * 2**20 // frame_bytes))
+    # Clips a smoother waits for before finalizing a label (Gaussian radius, Viterbi lag)
+    lookahead = max((getattr(smoother, 'radius', 0) or getattr(smoother, 'lag', 0)
+                     for smoother in outputs.values() if smoother is not None), default=0)
+    if batch_size is None:
+        batch_size = auto_batch_size(device)
+        if burn:
+            batch_size = max(1, min(batch_size, (max_pending - clip_length) // step - lookahead))
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writers = {
+        name: cv2.VideoWriter(os.path.join(save_path, f"{name}.mp4"), fourcc, fps, (width, height))
+        for name in outputs
+    } if burn else {}
+    labels = {name: [] for name in outputs}
+    output_probs = {name: [] for name in outputs}
+    pending = deque()
+    deferred = False
+    written = 0
+    timestamps = []
+
+    def to_bgr(frame):
+        with stage('convert'):
+            return cv2.cvtColor(frame.permute(1, 2, 0).numpy(), cv2.COLOR_RGB2BGR)
+
+    def decoded_frames():
+        nonlocal deferred
+        for frame in iter_video_frames(video_path, timestamps):
+            if burn and not deferred:
+                pending.append(to_bgr(frame))
+                if len(pending) > max_pending:
+                    # Over the memory cap: the unwritten frames are decoded again at the end
+                    needed_mb = (clip_length + (lookahead + batch_size) * step) * frame_bytes / 2**20
+                    print(f"Warning: more than {max_buffer_mb:g} MB of frames waiting for their labels, "
+                          f"the rest of the video will be decoded again (about {needed_mb:.0f} MB "
+                          f"are needed with batch_size={batch_size})")
+                    deferred = True
+                    pending.clear()
+            yield resize_frames(frame)
+
+    def write_frame(frame):
+        nonlocal written
+        clip_index = written // step
+        for name, writer in writers.items():
+            with stage('overlay'):
+                annotated = frame.copy()
+                _draw_label(annotated, class_names[labels[name][clip_index]])
+            with stage('encode'):
+                writer.write(annotated)
+        written += 1
+        count('frames_written')
 
+    def write_ready_frames():
+        if not burn:
+            return
+        ready = min(len(clip_labels) for clip_labels in labels.values())
+        while pending and written // step < ready:
+            write_frame(pending.popleft())
+
+    model.eval()
+    raw_probs = []
+    clips = iter_clips(decoded_frames(), clip_length, step)
+    for probs in _iter_clip_probs(clips, model, device, batch_size):
+        probs = probs.numpy()
+        raw_probs.append(probs)
+        for name, smoother in outputs.items():
+            with stage('smooth'):
+                finalized = probs if smoother is None else smoother.update(probs)
+            output_probs[name].append(finalized)
+            labels[name].extend(finalized.argmax(axis=1).tolist())
+        write_ready_frames()
+
+    for name, smoother in outputs.items():
+        if smoother is not None:
+            finalized = smoother.finish()
+            if len(finalized):
+                output_probs[name].append(finalized)
+            labels[name].extend(finalized.argmax(axis=1).tolist())
+    write_ready_frames()
+    if deferred:
+        for index, frame in enumerate(iter_video_frames(video_path)):
+            if index >= written:
+                write_frame(to_bgr(frame))
+
+    for writer in writers.values():
+        writer.release()
+
+    timeline = Timeline(timestamps, fps)
+    results = {}
+    for name in outputs:
+        class_list = get_consecutive_classes(labels[name], class_names)
+        config_path = save_class_lists(class_list, fps, save_path, name, frames_per_class=step,
+                                       timeline=timeline) if write_json else None
+        if burn:
+            output_path = os.path.join(save_path, f"{name}.mp4")
+        elif render == 'subtitles':
+            output_path = save_subtitles(class_list, fps, save_path, name, frames_per_class=step,
+                                         timeline=timeline)
+        else:
+            output_path = None
+        results[name] = (output_path, config_path)
+
+    raw_probs = np.concatenate(raw_probs)
+    if return_details:
+        output_probs = {name: np.concatenate(probs) for name, probs in output_probs.items()}
+        return raw_probs.argmax(axis=1), raw_probs, results, output_probs, timeline
+    return raw_probs.argmax(axis=1), raw_probs, results
+
+def segment_boundaries(class_list, frames_per_class=16):
+    """
+    Compute the end frame (exclusive) of each segment of a consecutive class list.
+
+    Args:
+        class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+        frames_per_class (int): Number of video frames covered by one counted prediction.
+
+    Returns:
+        np.ndarray: Cumulative end frame of each segment.
+    """
+    return np.cumsum([n * frames_per_class for _, n in class_list], dtype=np.int64)
+
+def annotate_video_with_classes(input_video_path, class_list, save_path, file_name, frames_per_class=16,
+                                queue_size=64, render='burn', write_json=True, timeline=None):
+    """
+    Save the class list to JSON and render the labels over the input video.
+
+    Args:
+        input_video_path (str): Path to the input video.
+        class_list (List[Tuple[str, int]]): Consecutive classes and their counts.
+        save_path (str): Output directory.
+        file_name (str): Base name for the output files.
+        frames_per_class (int): Number of video frames covered by one counted prediction.
+        queue_size (int): Frames buffered between the decode, overlay and encode threads.
+        render (str): 'burn' to re-encode the video with the labels drawn on the frames,
+            'subtitles' to write an SRT sidecar instead (no re-encode), or 'none' to only
+            write the JSON files.
+        write_json (bool): Write the *_actions_frames.json and *_actions_seconds.json files.
+        timeline (Timeline): Frame timestamps of the video, read from the file if None.
+
+    Returns:
+        Tuple[str, str]: Annotated video (or subtitle file, or None) and JSON (or None) paths.
+    """
+    import cv2
+
+    if timeline is None:
+        timeline = Timeline.from_video(input_video_path)
 
     # Open input video
     cap = cv2.VideoCapture(input_video_path)
@@ -89,61 +646,94 @@ def annotate_video_with_classes(input_video_path, class_list, save_path, file_na
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"Video FPS: {fps}, Width: {width}, Height: {height}, Total Frames: {total_frames}")
-    # Convert class_list frame count into seconds via fps into a new list
-    class_seconds_list = [None] * len(class_list)
-    for i in range(len(class_list)):
-        class_name, frame_count = class_list[i]
-        class_seconds_list[i] = (class_name, round(((frame_count*16) / fps), 2))
-    
-    # write the class_seconds_list to a JSON file
-    config_path = os.path.join(save_path, f"{file_name}_actions_seconds.json")
-    with open(config_path, 'w') as f:
-        json.dump(class_seconds_list, f)
+
+    # Save actions list to JSON, in frames and in seconds
+    config_path = save_class_lists(class_list, fps, save_path, file_name, frames_per_class,
+                                   timeline=timeline) if write_json else None
+
+    # Outputs that do not touch the pixels only need the video metadata
+    if render != 'burn':
+        cap.release()
+        if render == 'subtitles':
+            return save_subtitles(class_list, fps, save_path, file_name, frames_per_class,
+                                  timeline=timeline), config_path
+        return None, config_path
 
     # Set up output video writer
     video_path = os.path.join(save_path, f"{file_name}.mp4")
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(video_path, fourcc, fps, (width, height))
 
-    # Text configuration
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 1.5
-    font_thickness = 3
-    text_color = (0, 255, 0)  # Green text
-    text_position = (50, 100)  # Top-left coordinates (x, y)
-
-    # Calculate class segments
-    current_class_index = 0
-    frames_remaining = 0
-    total_expected_frames = sum(n * 16 for _, n in class_list)
-    
-    # Warn if frame count mismatch
-    if total_frames != total_expected_frames:
-        print(f"Warning: Video has {total_frames} frames but class list expects {total_expected_frames}")
+    # Segment of every frame; the padded tail clip is cut at the last frame
+    frame_labels = timeline.frame_labels(class_list, frames_per_class)
+    covered_frames = int(np.count_nonzero(frame_labels >= 0))
+
+    # Warn if the class list does not reach the end of the video
+    if covered_frames < timeline.num_frames:
+        print(f"Warning: Video has {timeline.num_frames} frames but class list only covers {covered_frames}")
+
+    # Decode and encode in background threads so they overlap with the overlay
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def reader():
+        try:
+            while True:
+                with stage('decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                read_queue.put(frame)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            read_queue.put(None)
+
+    def writer():
+        try:
+            while (frame := write_queue.get()) is not None:
+                with stage('encode'):
+                    out.write(frame)
+                count('frames_written')
+        except Exception as e:
+            errors.append(e)
+            # Keep draining so the overlay loop never blocks
+            while write_queue.get() is not None:
+                pass
+
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+    for thread in threads:
+        thread.start()
 
     # Process video frame by frame
     frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Update current class based on frame count
-        if frame_count >= sum(n * 16 for _, n in class_list[:current_class_index + 1]):
-            current_class_index += 1
+    frame = None
+    try:
+        while (frame := read_queue.get()) is not None:
+            # Get current class name if available
+            segment = frame_labels[frame_count] if frame_count < len(frame_labels) else -1
+            current_class = class_list[segment][0] if segment >= 0 else ""
 
-        # Get current class name if available
-        current_class = class_list[current_class_index][0] if current_class_index < len(class_list) else ""
+            # Add text overlay
+            with stage('overlay'):
+                _draw_label(frame, current_class)
 
-        # Add text overlay
-        cv2.putText(frame, current_class, text_position, 
-                   font, font_scale, text_color, font_thickness)
+            # Write modified frame
+            write_queue.put(frame)
+            frame_count += 1
+    finally:
+        write_queue.put(None)
+        # If the overlay stopped early, unblock the reader before joining it
+        while frame is not None:
+            frame = read_queue.get()
+        for thread in threads:
+            thread.join()
 
-        # Write modified frame
-        out.write(frame)
-        frame_count += 1
+        # Cleanup
+        cap.release()
+        out.release()
 
-    # Cleanup
-    cap.release()
-    out.release()
+    if errors:
+        raise errors[0]
     return video_path, config_path
\ No newline at end of file
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from src.utils.utils import make_smoother, SMOOTHERS
+
+def _run_in_chunks(smoother, probs, chunk_size):
+    outputs = [smoother.update(probs[i:i + chunk_size]) for i in range(0, len(probs), chunk_size)]
+    outputs.append(smoother.finish())
+    return np.concatenate([out.reshape(-1, probs.shape[1]) for out in outputs])
+
+@pytest.mark.parametrize('name', SMOOTHERS)
+@pytest.mark.parametrize('window_size', [1, 3])
+def test_output_does_not_depend_on_chunking(name, window_size):
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        probs = rng.dirichlet(np.full(5, 0.5), size=int(rng.integers(1, 120))).astype(np.float32)
+        single = _run_in_chunks(make_smoother(name, window_size), probs, 1)
+        batched = _run_in_chunks(make_smoother(name, window_size), probs, 32)
+        assert len(single) == len(probs)
+        np.testing.assert_allclose(single, batched, rtol=1e-5, atol=1e-6)